@@ -1,5 +1,6 @@
 #!/usr/bin/env python
 
+from concurrent.futures import ThreadPoolExecutor
 from functools import partial
 from importlib import reload
 
@@ -9,7 +10,11 @@ import spsActor.Commands.cmdList as sync
 import spsActor.utils.driftSlitExposure.exposure as driftSlitExposure
 import spsActor.utils.driftSlitExposure.lampExposure as driftSlitLampExposure
 from ics.utils.threading import singleShot
-from spsActor.utils import exposure, lampsExposure
+from spsActor.utils import deferredExposure, exposure, isolatedExposure, lampsExposure
+from spsActor.utils.expQueue import ExposureQueue
+from spsActor.utils.resources import exposureResources
+from spsActor.utils.sequence import ExposureSequence
+from twisted.internet import reactor
 
 reload(exposure)
 reload(sync)
@@ -27,10 +32,16 @@ class ExposeCmd(object):
         # passed a le   le argument, the parsed and typed command.
         #
         spsArgs = '[<cam>] [<cams>] [<specNum>] [<specNums>] [<arm>] [<arms>]'
-        expArgs = f'[<visit>] {spsArgs} [<metadata>] [@doTest] [@doScienceCheck] [@skipBiaCheck]'
+        expArgs = f'[<visit>] {spsArgs} [<metadata>] [@doTest] [@doScienceCheck] [@skipBiaCheck] [@doAsync] [@doIsolate] [@doPipeline] [@doQueue]'
         lampsArgs = '[@doLamps] [@doShutterTiming]'
         windowingArgs = '[<window>] [<blueWindow>] [<redWindow>]'
+        # visits are allocated by the sequence itself.
+        seqArgs = f'<nExposures> {spsArgs} [<metadata>] [@doTest] [@doScienceCheck] [@skipBiaCheck]'
         self.exp = dict()
+        self.sequences = dict()
+        self.queue = ExposureQueue(self.actor, self.dispatchQueued, self.leaseQueued)
+        # visits are fetched while the pre-flight checks are running.
+        self.visitFetcher = ThreadPoolExecutor(max_workers=1, thread_name_prefix='visitFetcher')
 
         self.vocab = [
             ('expose', f'object <exptime> {expArgs} [@doIIS] {windowingArgs}', self.doExposure),
@@ -40,9 +51,20 @@ class ExposeCmd(object):
             ('expose', f'dark <exptime> {expArgs} {windowingArgs}', self.doExposure),
             ('expose', f'bias {expArgs} {windowingArgs}', self.doExposure),
 
+            ('expose', f'sequence object <exptime> {seqArgs} [@doIIS] {windowingArgs}', self.doExposure),
+            ('expose', f'sequence flat <exptime> {seqArgs} {lampsArgs} [@doIIS] [<slideSlit>] {windowingArgs}',
+             self.doExposure),
+            ('expose', f'sequence arc <exptime> {seqArgs} {lampsArgs} [@doIIS] {windowingArgs}', self.doExposure),
+            ('expose', f'sequence domeflat <exptime> {seqArgs} [@doIIS] {windowingArgs}', self.doExposure),
+            ('expose', f'sequence dark <exptime> {seqArgs} {windowingArgs}', self.doExposure),
+            ('expose', f'sequence bias {seqArgs} {windowingArgs}', self.doExposure),
+
+            ('expose', f'darkSet <exptime> {seqArgs} [@doSingleRamp] {windowingArgs}', self.doExposure),
+            ('expose', f'biasSet {seqArgs} {windowingArgs}', self.doExposure),
+
             ('erase', f'[<cam>] [<cams>]', self.doErase),
 
-            ('exposure', 'abort <visit>', self.abort),
+            ('exposure', 'abort <visit> [@discard]', self.abort),
             ('exposure', 'finish <visit>', self.finish),
             ('exposure', 'status', self.status)
         ]
@@ -64,6 +86,8 @@ class ExposeCmd(object):
                                                  help='arm to take exposure from'),
                                         keys.Key("visit", types.Int(),
                                                  help='PFS visit id'),
+                                        keys.Key("nExposures", types.Int(),
+                                                 help='number of exposures in the sequence'),
                                         keys.Key("window", types.Int() * (1, 2),
                                                  help='first row, total number of rows to read, br arms'),
                                         keys.Key("blueWindow", types.Int() * (1, 2),
@@ -82,7 +106,17 @@ class ExposeCmd(object):
                                                       'groupName, sequenceType, sequenceName, sequenceComments)'),
                                         )
 
+    @singleShot
     def doExposure(self, cmd):
+        """Pre-flight in another thread, so the reactor is never blocked and exposures start concurrently."""
+
+        def allocateVisits(cmdKeys, doSequence):
+            """Get visit, or all visits up front for a sequence, so the frames can run back-to-back."""
+            if doSequence:
+                return [self.actor.getVisit(cmd=cmd) for i in range(cmdKeys['nExposures'].values[0])]
+
+            return cmdKeys['visit'].values[0] if 'visit' in cmdKeys else self.actor.getVisit(cmd=cmd)
+
         def slitInHome(cams, cmd):
             """Return True if all slits are in home position."""
             notInHome = []
@@ -123,8 +157,13 @@ class ExposeCmd(object):
         for valid in ExposeCmd.expTypes:
             exptype = valid if valid in cmdKeys else exptype
 
+        # calibration sets reuse the same camera objects for every visit.
+        doCalibSet = 'biasSet' in cmdKeys or 'darkSet' in cmdKeys
+        exptype = ('bias' if 'biasSet' in cmdKeys else 'dark') if doCalibSet else exptype
+
         exptime = cmdKeys['exptime'].values[0] if exptype != 'bias' else 0
-        visit = cmdKeys['visit'].values[0] if 'visit' in cmdKeys else self.actor.getVisit(cmd=cmd)
+        doSequence = 'sequence' in cmdKeys or doCalibSet
+        visitFetch = self.visitFetcher.submit(allocateVisits, cmdKeys, doSequence)
 
         metadata = cmdKeys['metadata'].values if 'metadata' in cmdKeys else None
         doLamps = 'doLamps' in cmdKeys
@@ -135,6 +174,16 @@ class ExposeCmd(object):
         doBiaCheck = 'skipBiaCheck' not in cmdKeys
         doSlideSlit = 'slideSlit' in cmdKeys
         slideSlitPixelRange = cmdKeys['slideSlit'].values if doSlideSlit else False
+        doIsolate = 'doIsolate' in cmdKeys
+        # module exposure control isolated in worker processes, driven by the deferred engine.
+        doAsync = 'doAsync' in cmdKeys or doIsolate
+        doPipeline = 'doPipeline' in cmdKeys
+        doQueue = 'doQueue' in cmdKeys
+        doSingleRamp = 'doSingleRamp' in cmdKeys
+
+        # sequence frames are pipelined, unless lamps and slit are controlled visit per visit.
+        if doSequence and not doCalibSet:
+            doPipeline = not (doLamps or doShutterTiming or doSlideSlit or doIIS)
 
         if 'window' in cmdKeys:
             blueWindow = redWindow = cmdKeys['window'].values
@@ -156,19 +205,195 @@ class ExposeCmd(object):
         if doBiaCheck and not biaIsOff(cams, cmd):
             return
 
-        self.process(cmd, visit,
-                     exptype=exptype, exptime=exptime, cams=cams, doLamps=doLamps, metadata=metadata,
-                     doShutterTiming=doShutterTiming, doSlideSlit=doSlideSlit, doIIS=doIIS, doTest=doTest,
-                     blueWindow=blueWindow, redWindow=redWindow, slideSlitPixelRange=slideSlitPixelRange)
+        # deferred engine only drives the shutters, lamps and slit are still controlled by threads.
+        if doAsync and (doLamps or doShutterTiming or doSlideSlit):
+            cmd.warn('text="deferred engine does not support lamps or slit controlled exposures, using threads."')
+            doAsync = doIsolate = False
+
+        try:
+            visit = visitFetch.result()
+        except Exception as e:
+            cmd.fail(f'text="failed to get visit: {e}"')
+            return
+
+        expKwargs = dict(exptype=exptype, exptime=exptime, cams=cams, doLamps=doLamps, metadata=metadata,
+                         doShutterTiming=doShutterTiming, doSlideSlit=doSlideSlit, doIIS=doIIS, doTest=doTest,
+                         blueWindow=blueWindow, redWindow=redWindow, slideSlitPixelRange=slideSlitPixelRange,
+                         doPipeline=doPipeline, doSingleRamp=doSingleRamp)
+
+        # just acknowledge, the exposure will be dispatched as soon as the cameras are free.
+        if doQueue:
+            if visit in self.exp.keys() or visit in self.queue:
+                cmd.fail(f'text="exposure(visit={visit}) already ongoing or queued"')
+                return
+
+            entry = self.queue.put(visit, exposureResources(self.actor.spsConfig, **expKwargs), **expKwargs)
+            cmd.finish(f'queued={entry.queueId},{visit}')
+            return
+
+        if doCalibSet:
+            process = self.processCalibSet
+        elif doSequence:
+            process = self.processSequence
+        elif doAsync:
+            # deferred engine lives in the reactor thread.
+            process = partial(reactor.callFromThread, self.processAsync, doIsolate=doIsolate)
+        else:
+            process = self.process
+
+        process(cmd, visit, **expKwargs)
 
     @singleShot
-    def process(self, cmd, visit, exptype, doLamps, doShutterTiming, doSlideSlit, doIIS, **kwargs):
-        """Process exposure in another thread """
+    def process(self, cmd, visit, exptype, doLamps, doShutterTiming, doSlideSlit, doIIS, doneFunc=None, isLeased=False,
+                **kwargs):
+        """Process exposure in another thread, queued entries are leased already when dispatched."""
+        doneFunc = self.exposureDone if doneFunc is None else doneFunc
 
-        if visit in self.exp.keys():
-            cmd.fail(f'text="exposure(visit={visit}) already ongoing"')
+        try:
+            if visit in self.exp.keys():
+                cmd.fail(f'text="exposure(visit={visit}) already ongoing"')
+                return
+
+            if not isLeased and not self.leaseResources(cmd, visit, exptype=exptype, doLamps=doLamps,
+                                                        doSlideSlit=doSlideSlit, doIIS=doIIS, **kwargs):
+                return
+
+            try:
+                cls = self.exposureClass(exptype, doLamps, doShutterTiming, doSlideSlit, doIIS)
+                exp = cls(self.actor, visit, exptype=exptype, doIIS=doIIS, **kwargs)
+                self.exp[visit] = exp
+
+                try:
+                    fileIds = exp.waitForCompletion(cmd, visit=visit)
+                    doneFunc(cmd, exp, fileIds)
+
+                finally:
+                    exp.exit()
+                    self.exp.pop(visit, None)
+
+            finally:
+                self.actor.resources.release(visit)
+
+        finally:
+            # whatever happened, queued entry is over and the next ones can be dispatched.
+            self.queue.exposureEnded(visit)
+
+    @singleShot
+    def processSequence(self, cmd, visits, exptype, doLamps, doShutterTiming, doSlideSlit, doIIS, doPipeline, **kwargs):
+        """Process a sequence of exposures in another thread."""
+        ongoing = [str(visit) for visit in visits if visit in self.exp.keys()]
+
+        if ongoing:
+            cmd.fail(f'text="exposure(visit={",".join(ongoing)}) already ongoing"')
+            return
+
+        # frames of the sequence share a single lease, held by the first visit.
+        if not self.leaseResources(cmd, visits[0], exptype=exptype, doLamps=doLamps, doSlideSlit=doSlideSlit,
+                                   doIIS=doIIS, **kwargs):
+            return
+
+        cls = self.exposureClass(exptype, doLamps, doShutterTiming, doSlideSlit, doIIS)
+        sequence = ExposureSequence(self.actor, visits, cls, doPipeline, exptype=exptype, doIIS=doIIS, **kwargs)
+
+        for visit in visits:
+            self.sequences[visit] = sequence
+
+        try:
+            sequence.run(cmd, self.exp)
+        finally:
+            for visit in visits:
+                self.sequences.pop(visit, None)
+
+            self.actor.resources.release(visits[0])
+            self.queue.dispatch()
+
+        failures = sequence.failures.format()
+
+        if failures:
+            cmd.fail(f'text="{failures}"')
+        else:
+            cmd.finish(f'text="{sequence.nDone}/{len(visits)} exposures done"')
+
+    @singleShot
+    def processCalibSet(self, cmd, visits, exptype, doIIS, **kwargs):
+        """Process a bias/dark set in another thread."""
+        ongoing = [str(visit) for visit in visits if visit in self.exp.keys()]
+
+        if ongoing:
+            cmd.fail(f'text="exposure(visit={",".join(ongoing)}) already ongoing"')
             return
 
+        if not self.leaseResources(cmd, visits[0], exptype=exptype, doIIS=doIIS, **kwargs):
+            return
+
+        try:
+            exp = exposure.DarkSet(self.actor, visits, exptype=exptype, doIIS=doIIS, **kwargs)
+        except Exception:
+            self.actor.resources.release(visits[0])
+            raise
+
+        for visit in visits:
+            self.exp[visit] = exp
+
+        try:
+            allFileIds = exp.run(cmd)
+
+        finally:
+            exp.exit()
+
+            for visit in visits:
+                self.exp.pop(visit, None)
+
+            self.actor.resources.release(visits[0])
+            self.queue.dispatch()
+
+        for fileIds in allFileIds:
+            cmd.inform(fileIds)
+
+        failures = exp.failures.format()
+
+        if failures:
+            cmd.fail(f'text="{failures}"')
+        else:
+            cmd.finish(f'text="{len(allFileIds)}/{len(visits)} exposures done"')
+
+    def leaseResources(self, cmd, owner, doPipeline=False, **kwargs):
+        """Lease exposure resources to owner, fail the command and return False if any of them is already leased."""
+        resources = exposureResources(self.actor.spsConfig, **kwargs)
+        conflicts = self.actor.resources.lease(owner, resources, shareable=self.shareable(kwargs['cams'], doPipeline))
+
+        if conflicts:
+            cmd.fail(f'text="resources already in use: {",".join(conflicts)}, use doQueue to queue the exposure"')
+            return False
+
+        return True
+
+    def leaseQueued(self, entry):
+        """Lease queued entry resources, return the conflicting ones if any, in which case nothing is leased."""
+        shareable = self.shareable(entry.expKwargs['cams'], entry.expKwargs.get('doPipeline', False))
+        return self.actor.resources.lease(entry.visit, entry.resources, shareable=shareable)
+
+    def shareable(self, cams, doPipeline):
+        """Return the resources a pipelined exposure can share with the other pipelined owners."""
+        if not doPipeline:
+            return set()
+
+        # pipelined exposures wait for the cameras to be handed over, so they can share them.
+        shareable = set(map(str, cams))
+
+        # shutters are only opened once every camera of the module is wiped, so they can be shared as well, provided
+        # every other owner uses one of those cameras too, meaning that it closed the shutters before handing it over.
+        for specNum in set([cam.specNum for cam in cams]):
+            moduleCams = set([str(cam) for cam in cams if cam.specNum == specNum])
+            enu = f'enu_sm{specNum}'
+
+            if all([moduleCams & self.actor.resources.leasedBy(other) for other in self.actor.resources.owners(enu)]):
+                shareable.add(enu)
+
+        return shareable
+
+    def exposureClass(self, exptype, doLamps, doShutterTiming, doSlideSlit, doIIS):
+        """Return the exposure class to be used given the exposure type and options."""
         if exptype in ['bias', 'dark']:
             cls = exposure.DarkExposure
         elif doSlideSlit:
@@ -183,22 +408,75 @@ class ExposeCmd(object):
         else:
             cls = exposure.Exposure
 
-        exp = cls(self.actor, visit, exptype=exptype, doIIS=doIIS, **kwargs)
-        self.exp[visit] = exp
+        return cls
 
-        try:
-            fileIds = exp.waitForCompletion(cmd, visit=visit)
-            failures = exp.failures.format()
+    def processAsync(self, cmd, visit, exptype, doLamps, doShutterTiming, doSlideSlit, doIIS, doIsolate=False,
+                     **kwargs):
+        """Process exposure with the deferred engine, from the reactor thread."""
 
-            if failures:
-                cmd.warn(fileIds)
-                cmd.fail(f'text="{exp.failures.format()}"')
-            else:
-                cmd.finish(fileIds)
+        def failed(failure):
+            cmd.fail(f'text="{failure.getErrorMessage()}"')
 
-        finally:
+        def cleanup(result):
             exp.exit()
             self.exp.pop(visit, None)
+            self.actor.resources.release(visit)
+            self.queue.exposureEnded(visit)
+
+        if visit in self.exp.keys():
+            cmd.fail(f'text="exposure(visit={visit}) already ongoing"')
+            return
+
+        if not self.leaseResources(cmd, visit, exptype=exptype, doLamps=doLamps, doSlideSlit=doSlideSlit,
+                                   doIIS=doIIS, **kwargs):
+            return
+
+        # no spectrograph module control for biases and darks, nothing to isolate.
+        if exptype in ['bias', 'dark']:
+            cls = deferredExposure.DarkExposure
+        else:
+            cls = isolatedExposure.Exposure if doIsolate else deferredExposure.Exposure
+
+        try:
+            exp = cls(self.actor, visit, exptype=exptype, doIIS=doIIS, **kwargs)
+        except Exception as e:
+            self.actor.resources.release(visit)
+            self.queue.exposureEnded(visit)
+            cmd.fail(f'text="{e}"')
+            return
+
+        self.exp[visit] = exp
+
+        deferred = exp.run(cmd, visit=visit)
+        deferred.addCallbacks(partial(self.exposureDone, cmd, exp), failed)
+        deferred.addBoth(cleanup)
+
+    def exposureDone(self, cmd, exp, fileIds):
+        """Generate fileIds and finish the command, or fail it if anything went wrong."""
+        failures = exp.failures.format()
+
+        if failures:
+            cmd.warn(fileIds)
+            cmd.fail(f'text="{exp.failures.format()}"')
+        else:
+            cmd.finish(fileIds)
+
+    def dispatchQueued(self, entry):
+        """Process queued exposure, replies are broadcasted since the client command is long gone."""
+        self.process(self.actor.bcast, entry.visit, doneFunc=partial(self.queuedExposureDone, entry), isLeased=True,
+                     **entry.expKwargs)
+
+    def queuedExposureDone(self, entry, cmd, exp, fileIds):
+        """Generate fileIds and set queue entry status."""
+        failures = exp.failures.format()
+
+        if failures:
+            entry.status = 'failed'
+            cmd.warn(fileIds)
+            cmd.warn(f'text="{failures}"')
+        else:
+            entry.status = 'done'
+            cmd.inform(fileIds)
 
     def doErase(self, cmd):
         """ Move multiple ccdMotors synchronously. """
@@ -218,9 +496,15 @@ class ExposeCmd(object):
         syncCmd.process(cmd)
 
     def abort(self, cmd):
-        """Abort current exposure."""
+        """Abort current exposure, data is only thrown away with discard."""
         cmdKeys = cmd.cmd.keywords
         visit = cmdKeys['visit'].values[0]
+        discard = 'discard' in cmdKeys
+
+        # not started yet, just remove it from the queue.
+        if self.queue.remove(visit):
+            cmd.finish(f'text="visit:{visit} removed from exposure queue"')
+            return
 
         try:
             exposure = self.exp[visit]
@@ -228,7 +512,20 @@ class ExposeCmd(object):
             cmd.fail(f'text="visit:{visit} is not ongoing, valids:{",".join(map(str, self.exp.keys()))} "')
             return
 
-        exposure.finish(cmd)
+        ongoing = [exposure]
+        sequence = self.sequences.get(visit)
+
+        # aborting the whole sequence, if any.
+        if sequence is not None:
+            sequence.stop()
+            ongoing = list(filter(None, [self.exp.get(visit) for visit in sequence.visits]))
+
+        for exposure in ongoing:
+            if discard:
+                exposure.abort(cmd)
+            else:
+                exposure.finish(cmd)
+
         cmd.finish('text="aborting exposure now !"')
 
     def finish(self, cmd):
@@ -242,6 +539,10 @@ class ExposeCmd(object):
             cmd.fail(f'text="visit:{visit} is not ongoing, valids:{",".join(map(str, self.exp.keys()))} "')
             return
 
+        # no more frame will be started if part of a sequence.
+        if visit in self.sequences:
+            self.sequences[visit].stop()
+
         exposure.finish(cmd)
         cmd.finish('text="exposure finalizing now..."')
 
@@ -249,4 +550,9 @@ class ExposeCmd(object):
         for visit, exp in self.exp.items():
             cmd.inform(f'text="Exposure(visit={visit} exptype={exp.exptype} exptime={exp.exptime}"')
 
+        for entry in self.queue.entries:
+            cmd.inform(entry.genKey())
+
+        self.queue.genStatus(cmd=cmd)
+        self.actor.resources.genStatus(cmd)
         cmd.finish()
@@ -18,27 +18,29 @@ class SyncCmd(object):
         #
         self.name = "sync"
         spsArgs = '[<cam>] [<cams>] [<specNum>] [<specNums>] [<arm>] [<arms>]'
+        # optional overall deadline, see SpsCmd.process.
+        syncArgs = f'{spsArgs} [<timeout>]'
         self.vocab = [
-            ('slit', f'<focus> [@(microns)] [@(abs)] {spsArgs}', self.slitFocus),
-            ('slit', f'dither [<x>] [<y>] [<focus>] [@(pixels|microns)] [@(abs)] {spsArgs}', self.slitDither),
-            ('slit', f'home {spsArgs}', self.slitHome),
-            ('slit', f'start [@(fullInit)] {spsArgs}', self.slitStart),
-            ('slit', f'stop {spsArgs}', self.slitStop),
-
-            ('rda', f'@moveTo @(low|med) {spsArgs}', self.rdaMove),
-
-            ('bia', f'@on [strobe] [<power>] [<duty>] [<period>] {spsArgs}', self.biaSwitchOn),
-            ('bia', f'@off {spsArgs}', self.biaSwitchOff),
-            ('bia', f'@strobe @off {spsArgs}', self.biaSwitchOff),
-            ('bia', '@callbackOn [strobe] [<power>] [<duty>] [<period>]', self.biaCallbackOn),
-            ('bia', '@callbackOff', self.biaCallbackOff),
-
-            ('iis', f'<on> [<warmingTime>] {spsArgs}', self.iisOn),
-            ('iis', f'<off> {spsArgs}', self.iisOff),
-            ('iis', f'prepare [<halogen>] [<argon>] [<hgar>] [<neon>] [<krypton>] {spsArgs}', self.iisPrepare),
-            ('ccdMotors', f'move [<a>] [<b>] [<c>] [<piston>] [@(microns)] [@(abs)] {spsArgs}', self.ccdMotors),
-            ('fpa', f'toFocus {spsArgs}', self.fpaToFocus),
-            ('fpa', f'moveFocus [<microns>] [@(abs)] {spsArgs}', self.fpaMoveFocus),
+            ('slit', f'<focus> [@(microns)] [@(abs)] {syncArgs}', self.slitFocus),
+            ('slit', f'dither [<x>] [<y>] [<focus>] [@(pixels|microns)] [@(abs)] {syncArgs}', self.slitDither),
+            ('slit', f'home {syncArgs}', self.slitHome),
+            ('slit', f'start [@(fullInit)] {syncArgs}', self.slitStart),
+            ('slit', f'stop {syncArgs}', self.slitStop),
+
+            ('rda', f'@moveTo @(low|med) {syncArgs}', self.rdaMove),
+
+            ('bia', f'@on [strobe] [<power>] [<duty>] [<period>] {syncArgs}', self.biaSwitchOn),
+            ('bia', f'@off {syncArgs}', self.biaSwitchOff),
+            ('bia', f'@strobe @off {syncArgs}', self.biaSwitchOff),
+            ('bia', '@callbackOn [strobe] [<power>] [<duty>] [<period>] [<timeout>]', self.biaCallbackOn),
+            ('bia', '@callbackOff [<timeout>]', self.biaCallbackOff),
+
+            ('iis', f'<on> [<warmingTime>] {syncArgs}', self.iisOn),
+            ('iis', f'<off> {syncArgs}', self.iisOff),
+            ('iis', f'prepare [<halogen>] [<argon>] [<hgar>] [<neon>] [<krypton>] {syncArgs}', self.iisPrepare),
+            ('ccdMotors', f'move [<a>] [<b>] [<c>] [<piston>] [@(microns)] [@(abs)] {syncArgs}', self.ccdMotors),
+            ('fpa', f'toFocus {syncArgs}', self.fpaToFocus),
+            ('fpa', f'moveFocus [<microns>] [@(abs)] {syncArgs}', self.fpaMoveFocus),
         ]
 
         # Define typed command arguments for the above commands.
@@ -84,6 +86,8 @@ class SyncCmd(object):
                                         keys.Key('hgar', types.Float(), help='HgAr lamp on time'),
                                         keys.Key('neon', types.Float(), help='Ne lamp on time'),
                                         keys.Key('krypton', types.Float(), help='Kr lamp on time'),
+                                        keys.Key('timeout', types.Float(),
+                                                 help='overall deadline in seconds for every command to return'),
                                         )
 
     @property
@@ -93,6 +97,12 @@ class SyncCmd(object):
         except KeyError:
             raise RuntimeError('%s controller is not connected.' % self.name)
 
+    @staticmethod
+    def overallTimeout(cmd):
+        """Return optional overall deadline in seconds, None means waiting for every command time limit."""
+        cmdKeys = cmd.cmd.keywords
+        return cmdKeys['timeout'].values[0] if 'timeout' in cmdKeys else None
+
     @singleShot
     def slitFocus(self, cmd):
         """Focus multiple slits synchronously."""
@@ -104,7 +114,7 @@ class SyncCmd(object):
         abs = 'abs' in cmdKeys
 
         syncCmd = sync.SlitMove(self.actor, specNums=specNums, cmdHead='', focus=focus, microns=microns, abs=abs)
-        syncCmd.process(cmd)
+        syncCmd.process(cmd, timeout=self.overallTimeout(cmd))
 
     @singleShot
     def slitDither(self, cmd):
@@ -121,7 +131,7 @@ class SyncCmd(object):
 
         syncCmd = sync.SlitMove(self.actor, specNums=specNums, cmdHead='dither',
                                 x=ditherX, y=ditherY, focus=focus, microns=microns, pixels=pixels, abs=abs)
-        syncCmd.process(cmd)
+        syncCmd.process(cmd, timeout=self.overallTimeout(cmd))
 
     @singleShot
     def slitHome(self, cmd):
@@ -130,7 +140,7 @@ class SyncCmd(object):
         specNums = self.actor.spsConfig.keysToSpecNum(cmdKeys)
 
         syncCmd = sync.SlitMove(self.actor, specNums=specNums, cmdHead='home')
-        syncCmd.process(cmd)
+        syncCmd.process(cmd, timeout=self.overallTimeout(cmd))
 
     @singleShot
     def slitStart(self, cmd):
@@ -141,7 +151,7 @@ class SyncCmd(object):
         fullInit = 'fullInit' in cmdKeys
 
         syncCmd = sync.SlitStart(self.actor, specNums=specNums, fullInit=fullInit)
-        syncCmd.process(cmd)
+        syncCmd.process(cmd, timeout=self.overallTimeout(cmd))
 
     @singleShot
     def slitStop(self, cmd):
@@ -150,7 +160,7 @@ class SyncCmd(object):
         specNums = self.actor.spsConfig.keysToSpecNum(cmdKeys)
 
         syncCmd = sync.SlitStop(self.actor, specNums=specNums)
-        syncCmd.process(cmd)
+        syncCmd.process(cmd, timeout=self.overallTimeout(cmd))
 
     @singleShot
     def rdaMove(self, cmd):
@@ -166,7 +176,7 @@ class SyncCmd(object):
             raise ValueError('incorrect target position')
 
         syncCmd = sync.RdaMove(self.actor, specNums=specNums, targetPosition=targetPosition)
-        syncCmd.process(cmd)
+        syncCmd.process(cmd, timeout=self.overallTimeout(cmd))
 
     @singleShot
     def biaSwitchOn(self, cmd):
@@ -182,7 +192,7 @@ class SyncCmd(object):
 
         syncCmd = sync.BiaSwitch(self.actor, state='on', specNums=specNums,
                                  strobe=strobe, power=power, period=period, duty=duty)
-        syncCmd.process(cmd)
+        syncCmd.process(cmd, timeout=self.overallTimeout(cmd))
 
     @singleShot
     def biaSwitchOff(self, cmd):
@@ -194,7 +204,7 @@ class SyncCmd(object):
         state = 'strobe off' if 'strobe' in cmdKeys else 'off'
 
         syncCmd = sync.BiaSwitch(self.actor, state=state, specNums=specNums)
-        syncCmd.process(cmd)
+        syncCmd.process(cmd, timeout=self.overallTimeout(cmd))
 
     @singleShot
     def biaCallbackOn(self, cmd):
@@ -207,13 +217,13 @@ class SyncCmd(object):
 
         syncCmd = sync.BiaSwitch(self.actor, state='callbackOn', specNums=[1, 2, 3, 4],
                                  strobe=strobe, power=power, period=period, duty=duty)
-        syncCmd.process(cmd)
+        syncCmd.process(cmd, timeout=self.overallTimeout(cmd))
 
     @singleShot
     def biaCallbackOff(self, cmd):
         """Propagate bia callbackOff to enu_sm1-4."""
         syncCmd = sync.BiaSwitch(self.actor, state='callbackOff', specNums=[1, 2, 3, 4])
-        syncCmd.process(cmd)
+        syncCmd.process(cmd, timeout=self.overallTimeout(cmd))
 
     @singleShot
     def ccdMotors(self, cmd):
@@ -230,7 +240,7 @@ class SyncCmd(object):
 
         syncCmd = sync.FpaMove(self.actor, cams=cams, cmdHead='move',
                                a=a, b=b, c=c, piston=piston, microns=microns, abs=abs)
-        syncCmd.process(cmd)
+        syncCmd.process(cmd, timeout=self.overallTimeout(cmd))
 
     @singleShot
     def fpaToFocus(self, cmd):
@@ -239,7 +249,7 @@ class SyncCmd(object):
         cams = self.actor.spsConfig.keysToCam(cmdKeys)
 
         syncCmd = sync.FpaMove(self.actor, cams=cams, cmdHead='toFocus')
-        syncCmd.process(cmd)
+        syncCmd.process(cmd, timeout=self.overallTimeout(cmd))
 
     @singleShot
     def fpaMoveFocus(self, cmd):
@@ -251,7 +261,7 @@ class SyncCmd(object):
         abs = 'abs' in cmdKeys
 
         syncCmd = sync.FpaMove(self.actor, cams=cams, microns=microns, abs=abs, cmdHead='moveFocus')
-        syncCmd.process(cmd)
+        syncCmd.process(cmd, timeout=self.overallTimeout(cmd))
 
     @singleShot
     def iisOn(self, cmd):
@@ -262,7 +272,7 @@ class SyncCmd(object):
         warmingTime = cmdKeys['warmingTime'].values[0] if 'warmingTime' in cmdKeys else False
 
         syncCmd = sync.IisOn(self.actor, specNums=specNums, on=on, warmingTime=warmingTime)
-        syncCmd.process(cmd)
+        syncCmd.process(cmd, timeout=self.overallTimeout(cmd))
 
     @singleShot
     def iisOff(self, cmd):
@@ -272,7 +282,7 @@ class SyncCmd(object):
         off = cmdKeys['off'].values
 
         syncCmd = sync.IisOff(self.actor, specNums=specNums, off=off)
-        syncCmd.process(cmd)
+        syncCmd.process(cmd, timeout=self.overallTimeout(cmd))
 
     @singleShot
     def iisPrepare(self, cmd):
@@ -282,4 +292,4 @@ class SyncCmd(object):
         lampKeys = {name: int(round(cmdKeys[name].values[0])) for name in lampState.allLamps if name in cmdKeys}
 
         syncCmd = sync.IisPrepare(self.actor, specNums=specNums, **lampKeys)
-        syncCmd.process(cmd)
+        syncCmd.process(cmd, timeout=self.overallTimeout(cmd))
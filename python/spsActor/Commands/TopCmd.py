@@ -22,6 +22,7 @@ class TopCmd(object):
             ('ping', '', self.ping),
             ('status', '', self.status),
             ('declareLightSource', f'[<sm1>] [<sm2>] [<sm3>] [<sm4>] [{lightSources}]', self.declareLightSource),
+            ('visitPool', '[@flush]', self.visitPool),
 
         ]
 
@@ -44,9 +45,21 @@ class TopCmd(object):
         cmd.inform('text="Present!"')
         self.actor.sendVersionKey(cmd)
         self.actor.genSpsKeys(cmd)
+        self.actor.preWipe.genStatus(cmd)
 
         cmd.finish()
 
+    def visitPool(self, cmd):
+        """Report visit pool status, drop and report the reserved visits if flush."""
+        cmdKeys = cmd.cmd.keywords
+
+        if 'flush' in cmdKeys:
+            unused = self.actor.visitPool.flush()
+            cmd.inform(f'unusedVisits={",".join(map(str, unused)) if unused else "none"}')
+
+        self.actor.visitPool.genStatus(cmd)
+        cmd.finish()
+
     def declareLightSource(self, cmd):
         """Report status and version; obtain and send current data"""
         cmdKeys = cmd.cmd.keywords
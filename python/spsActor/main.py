@@ -8,8 +8,17 @@ import actorcore.ICC
 from ics.utils.sps.config import SpsConfig
 from ics.utils.sps.spectroIds import getSite
 from pfs.utils.database import opdb
-from pfscore.gen2 import fetchVisitFromGen2
 from spsActor.utils.callbacks import MetaStatus
+from spsActor.utils.handover import CameraHandover
+from spsActor.utils.isolatedExposure import ModuleProcessPool
+from spsActor.utils.opdbStore import OpdbStore
+from spsActor.utils.preWipe import PreWipe
+from spsActor.utils.scheduler import Scheduler
+from spsActor.utils.timing import TimingModel
+from spsActor.utils.resources import ResourceManager
+from spsActor.utils.visitPool import VisitPool
+from spsActor.utils.workers import WorkerPool
+from twisted.internet import defer, reactor
 
 
 class SpsActor(actorcore.ICC.ICC):
@@ -29,15 +38,44 @@ class SpsActor(actorcore.ICC.ICC):
         self.spsConfig = None
         self.opdb = None
         self.metaStatus = MetaStatus(self)
+        # single timer thread, exposure objects register their deadlines and timeout checks with it.
+        self.scheduler = Scheduler(self)
+        self.scheduler.start()
+        # long-lived threads, leased to the camera and module objects of each visit.
+        self.workers = WorkerPool(self)
+        # which visit owns each camera, pipelined exposures wait for the previous visit to hand them over.
+        self.cameraHandover = CameraHandover()
+        # visits reserved from gen2 ahead of time.
+        self.visitPool = VisitPool(self)
+        # cameras, shutters, lamps and slits leased to ongoing exposures.
+        self.resources = ResourceManager()
+        # idle ccds erased in the background, so that exposures can use a short-path wipe.
+        self.preWipe = PreWipe(self)
+        # h4 ramp and ccd wipe durations learned from previous exposures.
+        self.timingModel = TimingModel()
+        # opdb rows are inserted in the background, in order.
+        self.opdbStore = OpdbStore(self)
+        # spectrograph module exposure control processes, they exit on their own when the actor goes away.
+        self.moduleProcesses = ModuleProcessPool(self)
 
     def crudeCall(self, cmd, actor, cmdStr, timeLim=60, **kwargs):
         """ crude actor call wrapper. """
         return self.cmdr.call(actor=actor, cmdStr=cmdStr.strip(), timeLim=timeLim, forUserCmd=cmd, **kwargs)
 
+    def deferredCall(self, cmd, actor, cmdStr, timeLim=60, **kwargs):
+        """ non-blocking actor call, the returned Deferred fires with the cmdVar once the command is done. """
+        deferred = defer.Deferred()
+        reactor.callFromThread(self.cmdr.bgCall, deferred.callback, actor=actor, cmdStr=cmdStr.strip(),
+                               timeLim=timeLim, forUserCmd=cmd, **kwargs)
+        return deferred
+
     def safeCall(self, cmd, actor, cmdStr, timeLim=60, **kwargs):
         """ call and throw warnings. """
         cmdVar = self.crudeCall(cmd, actor, cmdStr, timeLim=timeLim, **kwargs)
+        return self.warnOnFailure(cmd, actor, cmdStr, cmdVar)
 
+    def warnOnFailure(self, cmd, actor, cmdStr, cmdVar):
+        """ throw warnings if the command failed. """
         if cmdVar.didFail:
             reply = cmdVar.replyList[-1]
             repStr = reply.keywords.canonical(delimiter=';')
@@ -57,14 +95,15 @@ class SpsActor(actorcore.ICC.ICC):
             time.sleep(1)
 
     def getVisit(self, cmd):
-        """ Get visit from gen2 or get your own basically. """
-        return fetchVisitFromGen2(self, cmd)
+        """ Get visit from the pool of visits reserved from gen2. """
+        return self.visitPool.get(cmd)
 
     def reloadConfiguration(self, cmd):
         """ when reloading configuration file, reload spsConfig and status callbacks. """
         self.genSpsKeys(cmd)
         self.metaStatus.attachCallbacks()
         self.opdb = opdb.OpDB()
+        self.preWipe.start()
 
     def genSpsKeys(self, cmd):
         """ Generate sps config keywords. """
@@ -98,6 +137,7 @@ class SpsActor(actorcore.ICC.ICC):
         if self.everConnected is False:
             self.requireModels(['gen2', 'iis'])
             self.reloadConfiguration(self.bcast)
+            self.visitPool.refill()
             self.everConnected = True
 
     def insert(self, table, cmd=None, **kwargs):
@@ -107,6 +147,9 @@ class SpsActor(actorcore.ICC.ICC):
             self.opdb.insert_kw(table, **kwargs)
         except Exception as e:
             cmd.warn('text=%s' % self.strTraceback(e))
+            return False
+
+        return True
 
 
 def main():
@@ -0,0 +1,41 @@
+import threading
+
+
+class CamExpSets(object):
+    """Running, cleared, finished and storable camera exposures, only updated when a camera changes state."""
+
+    def __init__(self):
+        self.all = []
+        self.running = set()
+        self.cleared = set()
+        self.finished = set()
+        self.storable = set()
+        self.lock = threading.Lock()
+
+    @property
+    def isFinished(self):
+        return len(self.finished) == len(self.all)
+
+    def add(self, camExp):
+        """Start tracking a new camera exposure."""
+        with self.lock:
+            self.all.append(camExp)
+
+        self.update(camExp)
+
+    def update(self, camExp):
+        """Move camera exposure to the right sets given its current state."""
+        with self.lock:
+            for subset, isMember in [(self.running, not camExp.cleared),
+                                     (self.cleared, camExp.cleared),
+                                     (self.finished, camExp.isFinished),
+                                     (self.storable, camExp.storable)]:
+                if isMember:
+                    subset.add(camExp)
+                else:
+                    subset.discard(camExp)
+
+    def snapshot(self, subset):
+        """Return a copy of a subset, which can be safely iterated while cameras change state."""
+        with self.lock:
+            return list(subset)
@@ -1,12 +1,12 @@
 import ics.utils.cmd as cmdUtils
 import ics.utils.time as pfsTime
 import spsActor.utils.exception as exception
-from actorcore.QThread import QThread
 from ics.utils.threading import threaded
 from spsActor.utils.ids import SpsIds as idsUtils
+from spsActor.utils.workers import PooledThread
 
 
-class CcdExposure(QThread):
+class CcdExposure(PooledThread):
     # timeout setting.
     wipeTimeLim = 30
     readTimeLim = 90
@@ -25,24 +25,31 @@ class CcdExposure(QThread):
         self.cam = cam
         self.ccd = f'ccd_{cam}'
 
-        self.wipedAt = None
-        self.exptime = None
-        self.readVar = None
-        self.cleared = None
+        PooledThread.__init__(self, self.exp.actor, self.ccd)
 
-        QThread.__init__(self, self.exp.actor, self.ccd)
-        QThread.start(self)
-
-        self.activatedState = []
+        self.activatedState = set()
+        self.reset()
+        # only wakes up the threads of that spectrograph module, and the exposure-wide waiters.
+        self.stateChanged = exp.moduleStateChanged(cam.specNum)
 
         # add callback for shutters state, useful to fire process asynchronously.
         self.stateKeyVar = exp.actor.models[self.ccd].keyVarDict['exposureState']
+        self.lastState = self.stateKeyVar.getValue(doRaise=False)
         self.stateKeyVar.addCallback(self.exposureState)
 
     @property
     def exptype(self):
         return self.exp.exptype
 
+    def reset(self):
+        """ Reset exposure state, so that the same object can be used for the next visit. """
+        self.wipedAt = None
+        self.integrationDone = False
+        self.exptime = None
+        self.readVar = None
+        self.cleared = None
+        self.activatedState.clear()
+
     @property
     def storable(self):
         return self.readVar is not None
@@ -59,16 +66,33 @@ class CcdExposure(QThread):
     def wipeFlavour(self):
         return self.exp.wipeFlavour[self.cam.arm]
 
+    @property
+    def wipeTimingKey(self):
+        return f'{self.ccd}.wipe {self.wipeFlavour}'.strip()
+
+    @property
+    def expectedWipeDuration(self):
+        return self.actor.timingModel.predict(self.wipeTimingKey)
+
     @property
     def readFlavour(self):
         return self.exp.readFlavour[self.cam.arm]
 
+    @property
+    def filepath(self):
+        keys = cmdUtils.cmdVarToKeys(cmdVar=self.readVar)
+        return '/'.join(map(str, keys['filepath'].values))
+
     @property
     def state(self):
         if self.cleared:
             return 'cleared'
 
-        return self.exp.actor.models[self.ccd].keyVarDict['exposureState'].getValue(doRaise=False)
+        # read is done, the camera might already be used by the next visit.
+        if self.storable:
+            return 'idle'
+
+        return self.lastState
 
     @property
     def specConfig(self):
@@ -94,13 +118,39 @@ class CcdExposure(QThread):
         """Exposure State callback."""
         state = keyVar.getValue(doRaise=False)
         # track ccd state.
-        self.activatedState.append(state)
+        self.lastState = state
+        self.activatedState.add(state)
         self.actor.bcast.debug(f'text="{self.ccd} {state}"')
+        # wake up threads waiting on wipe/read barriers.
+        self.stateChanged.notify()
 
     def _wipe(self, cmd):
         """ Send ccd wipe command and handle reply """
-        cmdVar = self.actor.crudeCall(cmd, actor=self.ccd, cmdStr=f'wipe {self.wipeFlavour}',
-                                      timeLim=CcdExposure.wipeTimeLim)
+        self.activatedState.clear()
+        cmdStr = self.wipeCmdStr(cmd)
+        wipeStart = pfsTime.timestamp()
+        cmdVar = self.actor.crudeCall(cmd, actor=self.ccd, cmdStr=cmdStr, timeLim=CcdExposure.wipeTimeLim)
+        wipedAt = self.wipeReply(cmdVar)
+
+        # learn wipe duration, so that module can schedule it ahead of time, short-path wipe is not predicted.
+        if cmdStr.strip() == f'wipe {self.wipeFlavour}'.strip():
+            self.actor.timingModel.update(self.wipeTimingKey, wipedAt - wipeStart)
+        return wipedAt
+
+    def wipeCmdStr(self, cmd):
+        """ Build wipe command string, a freshly erased camera gets the short-path wipe if configured. """
+        isFresh = self.actor.preWipe.claim(self.cam)
+        shortWipe = self.actor.preWipe.shortWipeFlavour
+
+        # windowing wipe flavour always prevails.
+        if isFresh and shortWipe and not self.wipeFlavour:
+            cmd.debug(f'text="{self.ccd} freshly erased, using short-path wipe"')
+            return f'wipe {shortWipe}'
+
+        return f'wipe {self.wipeFlavour}'
+
+    def wipeReply(self, cmdVar):
+        """ Handle wipe reply, return wipe timestamp. """
         if cmdVar.didFail:
             raise exception.WipeFailed(self.ccd, cmdUtils.interpretFailure(cmdVar))
 
@@ -108,6 +158,13 @@ class CcdExposure(QThread):
 
     def _read(self, cmd, visit, dateobs, exptime=None):
         """ Send ccd read command and handle reply. """
+        cmdStr, exptime = self.readCmd(visit, dateobs, exptime=exptime)
+        cmdVar = self.actor.crudeCall(cmd, actor=self.ccd, cmdStr=cmdStr, timeLim=CcdExposure.readTimeLim)
+
+        return self.readReply(cmdVar, exptime)
+
+    def readCmd(self, visit, dateobs, exptime=None):
+        """ Keep exposure timing and build read command string. """
         self.dateobs = dateobs
         self.time_exp_end = pfsTime.timestamp()
 
@@ -124,48 +181,59 @@ class CcdExposure(QThread):
         if self.readFlavour:
             cmdParams[self.readFlavour] = True
 
-        cmdVar = self.actor.crudeCall(cmd, actor=self.ccd, cmdStr=cmdUtils.parse('read', **cmdParams),
-                                      timeLim=CcdExposure.readTimeLim)
+        return cmdUtils.parse('read', **cmdParams), exptime
 
+    def readReply(self, cmdVar, exptime):
+        """ Handle read reply, return exptime. """
         if cmdVar.didFail:
             raise exception.ReadFailed(self.ccd, cmdUtils.interpretFailure(cmdVar))
 
         self.readVar = cmdVar
+        # needed to build sps_exposure row.
+        self.exptime = exptime
+        self.exp.cameraRead(self)
+        self.exp.camStateChanged(self)
         return exptime
 
     def integrate(self):
         """ Integrate for exptime in seconds, doFinish==doAbort at the beginning of integration. """
-        if self.exp.doFinish:
-            raise exception.EarlyFinish
-        if self.exp.doAbort:
-            raise exception.ExposureAborted
+        self.exp.token.raiseIfCancelled()
 
         integrationEnd = self.wipedAt + self.exp.exptime
+        endOfIntegration = self.actor.scheduler.callAt(integrationEnd, self.declareIntegrationDone)
 
-        while pfsTime.timestamp() < integrationEnd:
-            if self.exp.doAbort:
-                raise exception.ExposureAborted
-            if self.exp.doFinish:
-                break
-
-            pfsTime.sleep.millisec()
+        try:
+            # finishing during integration just ends it early, only abort raises.
+            self.exp.token.waitFor(lambda: self.integrationDone or self.exp.doFinish, doFinish=False,
+                                   stateEvent=self.stateChanged)
+        finally:
+            endOfIntegration.cancel()
 
         # convert timestamp to localized datetime.
         dateobs = pfsTime.convert.datetime_from_timestamp(self.wipedAt)
         # dateobs is actually a string to be fast and consistent with expose.
         return pfsTime.convert.datetime_to_isoformat(dateobs)
 
+    def declareIntegrationDone(self):
+        """ Called by the actor scheduler when integration time is reached. """
+        self.integrationDone = True
+        self.stateChanged.notify()
+
     def clearExposure(self, cmd):
         """ Call ccdActor clearExposure command """
         if self.cleared is None:
             self.cleared = False
-            self.actor.safeCall(cmd, actor=self.ccd, cmdStr='clearExposure', timeLim=CcdExposure.clearTimeLim)
+            # camera never handed over, nothing to clear.
+            if self.exp.ownsCamera(self):
+                self.actor.safeCall(cmd, actor=self.ccd, cmdStr='clearExposure', timeLim=CcdExposure.clearTimeLim)
             self.cleared = True
+            self.exp.camStateChanged(self)
 
     @threaded
     def expose(self, cmd, visit):
         """ Full exposure routine for calib object. """
         try:
+            self.exp.waitForCamera(self)
             self.wipedAt = self._wipe(cmd)
             dateobs = self.integrate()
         except Exception as e:
@@ -184,8 +252,9 @@ class CcdExposure(QThread):
     def wipe(self, cmd):
         """ Wipe in thread. """
         try:
+            self.exp.waitForCamera(self)
             self.wipedAt = self._wipe(cmd)
-        except exception.WipeFailed as e:
+        except (exception.WipeFailed, exception.ExposureAborted, exception.EarlyFinish) as e:
             self.clearExposure(cmd)
             self.exp.abort(cmd, reason=str(e))
 
@@ -207,12 +276,10 @@ class CcdExposure(QThread):
 
         self.actor.logger.warning('Failed but still a chance to recover the data, not clearing the exposure...')
         self.cleared = True
+        self.exp.camStateChanged(self)
 
-    def store(self):
-        """ Store in sps_exposure in opDB database. """
-        if not self.storable:
-            return
-
+    def exposureRow(self):
+        """ Return camera name and sps_exposure row. """
         keys = cmdUtils.cmdVarToKeys(cmdVar=self.readVar)
         visit, beamConfigDate = keys['beamConfigDate'].values
         camStr, dateDir, visit, specNum, armNum = keys['spsFileIds'].values
@@ -223,12 +290,11 @@ class CcdExposure(QThread):
         # convert timestamp to datetime object.
         time_exp_end = pfsTime.Time.fromtimestamp(self.time_exp_end).to_datetime()
 
-        self.actor.insert('sps_exposure',
-                          pfs_visit_id=int(visit), sps_camera_id=int(cam.camId), exptime=float(self.exptime),
-                          time_exp_start=time_exp_start, time_exp_end=time_exp_end,
-                          beam_config_date=float(beamConfigDate))
+        row = dict(pfs_visit_id=int(visit), sps_camera_id=int(cam.camId), exptime=float(self.exptime),
+                   time_exp_start=time_exp_start, time_exp_end=time_exp_end,
+                   beam_config_date=float(beamConfigDate))
 
-        return cam.camName
+        return cam.camName, row
 
     def abort(self, cmd):
         """ Just a prototype. """
@@ -243,6 +309,6 @@ class CcdExposure(QThread):
         pass
 
     def exit(self):
-        """Overriding QThread.exit(self)"""
+        """Overriding PooledThread.exit(self)"""
         self.stateKeyVar.removeCallback(self.exposureState)
-        QThread.exit(self)
+        PooledThread.exit(self)
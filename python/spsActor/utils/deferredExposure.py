@@ -0,0 +1,339 @@
+import ics.utils.time as pfsTime
+import spsActor.utils.exception as exception
+from spsActor.utils import ccdExposure
+from spsActor.utils import exposure
+from spsActor.utils import hxExposure
+from twisted.internet import defer, reactor, task, threads
+
+# Deferred exposure engine.
+#
+# Same exposure logic as the threaded engine, but every step (wipe, ramp, shutters, read...) is a non-blocking
+# actor call returning a Deferred, and every wait is a barrier re-evaluated on each exposure state change.
+# Everything runs in the reactor thread, only blocking waits (pre-erase, opdb inserts) go to the reactor thread pool.
+
+
+def factory(exp, cam):
+    """Return deferred camera exposure object given the cam"""
+    if cam.arm in 'brm':
+        return CcdExposure(exp, cam)
+    elif cam.arm in 'n':
+        return HxExposure(exp, cam)
+    else:
+        raise ValueError(f'unknown arm:{cam.arm} ..')
+
+
+class CcdExposure(ccdExposure.CcdExposure):
+    """Ccd exposure, wipe and read return Deferreds."""
+
+    def _wipe(self, cmd):
+        """ Send ccd wipe command, fires with the wipe timestamp. """
+        self.activatedState.clear()
+        # background erase might still be running, wait for it outside the reactor.
+        deferred = threads.deferToThread(self.wipeCmdStr, cmd)
+        deferred.addCallback(lambda cmdStr: self.actor.deferredCall(cmd, actor=self.ccd, cmdStr=cmdStr,
+                                                                    timeLim=CcdExposure.wipeTimeLim))
+        return deferred.addCallback(self.wipeReply)
+
+    def _read(self, cmd, visit, dateobs, exptime=None):
+        """ Send ccd read command, fires with the exptime. """
+        cmdStr, exptime = self.readCmd(visit, dateobs, exptime=exptime)
+        deferred = self.actor.deferredCall(cmd, actor=self.ccd, cmdStr=cmdStr, timeLim=CcdExposure.readTimeLim)
+        return deferred.addCallback(self.readReply, exptime)
+
+    @defer.inlineCallbacks
+    def integrate(self):
+        """ Integrate for exptime in seconds, doFinish==doAbort at the beginning of integration. """
+        self.exp.token.raiseIfCancelled()
+
+        integrationEnd = self.wipedAt + self.exp.exptime
+        endOfIntegration = self.actor.scheduler.callAt(integrationEnd, self.declareIntegrationDone)
+
+        try:
+            # finishing during integration just ends it early, only abort raises.
+            yield self.exp.waitFor(lambda: self.integrationDone or self.exp.doFinish, doFinish=False)
+        finally:
+            endOfIntegration.cancel()
+
+        # convert timestamp to localized datetime.
+        dateobs = pfsTime.convert.datetime_from_timestamp(self.wipedAt)
+        # dateobs is actually a string to be fast and consistent with expose.
+        return pfsTime.convert.datetime_to_isoformat(dateobs)
+
+    def clearExposure(self, cmd):
+        """ Call ccdActor clearExposure command without blocking, fires once cleared. """
+        if self.cleared is None:
+            self.cleared = False
+            # camera never handed over, nothing to clear.
+            if not self.exp.ownsCamera(self):
+                self.clearReply(None, cmd)
+            else:
+                deferred = self.actor.deferredCall(cmd, actor=self.ccd, cmdStr='clearExposure',
+                                                   timeLim=CcdExposure.clearTimeLim)
+                deferred.addCallback(self.clearReply, cmd)
+
+        return self.exp.whenTrue(lambda: self.cleared)
+
+    def clearReply(self, cmdVar, cmd):
+        """ Handle clearExposure reply. """
+        if cmdVar is not None:
+            self.actor.warnOnFailure(cmd, self.ccd, 'clearExposure', cmdVar)
+
+        self.cleared = True
+        self.exp.camStateChanged(self)
+
+    @defer.inlineCallbacks
+    def expose(self, cmd, visit):
+        """ Full exposure routine for calib object. """
+        try:
+            yield self.exp.waitForCamera(self)
+            self.wipedAt = yield self._wipe(cmd)
+            dateobs = yield self.integrate()
+        except Exception as e:
+            # if it failed early or exposure aborted, clear and abort.
+            self.clearExposure(cmd)
+            self.exp.abort(cmd, reason=str(e))
+            return
+
+        try:
+            self.exptime = yield self._read(cmd, visit, dateobs)
+        except exception.ReadFailed as e:
+            self.handleReadFailed(cmd)
+            self.exp.failures.add(reason=str(e))  # at this point, no need to abort, just report the failure.
+
+    @defer.inlineCallbacks
+    def wipe(self, cmd):
+        """ Wipe without blocking. """
+        try:
+            yield self.exp.waitForCamera(self)
+            self.wipedAt = yield self._wipe(cmd)
+        except (exception.WipeFailed, exception.ExposureAborted, exception.EarlyFinish) as e:
+            self.clearExposure(cmd)
+            self.exp.abort(cmd, reason=str(e))
+
+    @defer.inlineCallbacks
+    def read(self, cmd, visit, dateobs, exptime):
+        """ Read without blocking. """
+        try:
+            self.exptime = yield self._read(cmd, visit, dateobs, exptime)
+        except exception.ReadFailed as e:
+            self.handleReadFailed(cmd)
+            self.exp.failures.add(reason=str(e))  # at this point, no need to abort, just report the failure.
+
+
+class HxExposure(hxExposure.HxExposure):
+    """H4 exposure, ramp and ramp finish return Deferreds."""
+
+    def _ramp(self, cmd, expectedExptime=0, doCheckTiming=False):
+        """Send h4 ramp command and handle reply."""
+        cmdStr, timeLim = self.rampCmd(expectedExptime=expectedExptime, doCheckTiming=doCheckTiming)
+        deferred = self.actor.deferredCall(cmd, actor=self.hx, cmdStr=cmdStr, timeLim=timeLim)
+        return deferred.addCallback(self.rampReply)
+
+    def ramp(self, cmd, expectedExptime):
+        """Start h4 ramp."""
+        deferred = self.exp.waitForCamera(self)
+        deferred.addCallback(lambda __: self._ramp(cmd, expectedExptime=expectedExptime, doCheckTiming=True))
+        return deferred.addErrback(self.rampFailed, cmd)
+
+    def expose(self, cmd, visit):
+        """Full exposure routine for calib object. """
+        # no need to go further.
+        if not self.nRead0:
+            return defer.succeed(None)
+
+        deferred = self.exp.waitForCamera(self)
+        deferred.addCallback(lambda __: self._ramp(cmd))
+        return deferred.addErrback(self.rampFailed, cmd)
+
+    def rampFailed(self, failure, cmd):
+        """Ramp errback."""
+        self.handleRampFailed(cmd, reason=str(failure.value))
+
+    def _finishRamp(self, cmd, doStop):
+        """Finish ramp, which will gather the final fits keys."""
+        if self.rampVar and self.rampVar.didFail:
+            return
+
+        deferred = self.actor.deferredCall(cmd, actor=self.hx, cmdStr=self.finishRampCmd(doStop), timeLim=60)
+        deferred.addCallback(self.finishRampReply)
+
+    def finishRampReply(self, cmdVar):
+        """Handle ramp finish reply."""
+        self.actor.logger.info(f'{self.hx} ramp finish didFail({cmdVar.didFail})')
+
+
+class SpecModuleExposure(exposure.SpecModuleExposure):
+    """Spectrograph module exposure, each step returns a Deferred."""
+
+    def __init__(self, *args, **kwargs):
+        exposure.SpecModuleExposure.__init__(self, *args, **kwargs)
+        # fired once detectors are cleared, reads are chained on it.
+        self.clearing = defer.succeed(None)
+
+    @defer.inlineCallbacks
+    def wipe(self, cmd):
+        """Wipe running CcdExposure and wait for integrating state.
+        Note that doFinish==doAbort at the beginning of integration."""
+        # Start the ramp.
+        if self.hxExposure:
+            self.hxExposure.ramp(cmd, expectedExptime=self.exp.exptime)
+
+            # And wait for the reset frame to start wiping ccds.
+            yield self.exp.waitFor(self.hxResetDone)
+            self.checkRampTiming()  # check that that reset is done in timely manner.
+
+        for camExp in self.runExp:
+            if camExp == self.hxExposure:
+                continue
+            camExp.wipe(cmd)
+
+        # # if one fails, it cleared itself out.
+        yield self.exp.whenTrue(self.detectorsWiped)
+        self.checkRampTiming()  # check that the first read is reached in timely manner.
+        self.exp.token.raiseIfCancelled()
+
+    def integrate(self, cmd, shutterTime=None):
+        """Integrate for both calib and regular exposure, fires with exptime and dateobs."""
+        cmdStr, timeLim = self.shuttersExposeCmd(shutterTime)
+        deferred = self.actor.deferredCall(cmd, actor=self.enuName, cmdStr=cmdStr, timeLim=timeLim)
+        return deferred.addCallback(self.parseShuttersReply)
+
+    def read(self, cmd, visit, exptime, dateobs):
+        """Read running CcdExposure, fires on idle state."""
+        for camExp in self.runExp:
+            camExp.read(cmd, visit=visit, exptime=exptime, dateobs=dateobs)
+
+        return self.exp.whenTrue(lambda: all(self.currently(state='idle')))
+
+    @defer.inlineCallbacks
+    def expose(self, cmd, visit):
+        """Full exposure routine, exceptions are catched and handled under the cover."""
+        try:
+            yield self.wipe(cmd)
+            self.listenToShutters()
+            self.postWipeFunc()
+            exposeStart = pfsTime.Time.now()
+            try:
+                exptime, dateobs = yield self.integrate(cmd)
+            except Exception as e:
+                if not self.shutterState.wasOpen:
+                    self.actor.logger.warning(f'{self.specName} shutters failed before opening, discarding data...')
+                    yield task.deferLater(reactor, 1, lambda: None)
+                    raise
+
+                self.actor.logger.warning(f'{self.specName} shutters failed after opening, still reading data...')
+                self.exp.failures.add(reason=str(e))
+                exptime = pfsTime.Time.now().timestamp() - exposeStart.timestamp()
+                dateobs = exposeStart.isoformat()
+
+        except Exception as e:
+            self.exp.abort(cmd, reason=str(e))
+            return
+
+        # exposure was discarded, detectors might still be clearing while shutters are already closed.
+        if self.exp.doAbort:
+            return
+
+        # never read detectors which are still being cleared.
+        yield self.clearing
+        yield self.read(cmd, visit=visit, exptime=exptime, dateobs=dateobs)
+
+    def clearExposure(self, cmd):
+        """Clear all running camera exposures, clear commands do not block so they are all sent at once.
+
+        Fires once every camera is cleared.
+        """
+        cleared = [defer.maybeDeferred(camExp.clearExposure, cmd) for camExp in self.runExp]
+        return defer.gatherResults(cleared, consumeErrors=True)
+
+    def finish(self, cmd, doDiscard=False):
+        """Command shutters to finish the exposure without blocking, see exposure.SpecModuleExposure.finish."""
+        # If shutters were not open or doDiscard is forced, discard CCDs and stop the ramp.
+        if not self.shutterState.wasOpen or doDiscard:
+            self.clearing = self.clearExposure(cmd)
+
+        if self.shutterState.isOpen:
+            deferred = self.actor.deferredCall(cmd, actor=self.enuName, cmdStr='exposure finish')
+            deferred.addCallback(lambda cmdVar: self.actor.warnOnFailure(cmd, self.enuName, 'exposure finish', cmdVar))
+
+
+class Exposure(exposure.Exposure):
+    """Exposure driven by the reactor, see run()."""
+    SpecModuleExposureClass = SpecModuleExposure
+
+    def __init__(self, *args, **kwargs):
+        exposure.Exposure.__init__(self, *args, **kwargs)
+        self.barriers = []
+        # barriers are re-evaluated on every state change.
+        self.stateChanged.addListener(self.stateChangedCB)
+
+    def camExposure(self, cam):
+        """Create deferred camera exposure object."""
+        return self.track(factory(self, cam))
+
+    def whenTrue(self, predicate):
+        """Return a Deferred fired as soon as predicate() is True, must be called from the reactor thread."""
+        deferred = defer.Deferred()
+        self.barriers.append((predicate, deferred))
+        self.checkBarriers()
+        return deferred
+
+    def waitForCamera(self, camExp):
+        """Deferred counterpart of exposure.Exposure.waitForCamera."""
+        if not self.doPipeline:
+            return defer.succeed(None)
+
+        return self.waitFor(lambda: self.actor.cameraHandover.isOwner(camExp))
+
+    def waitFor(self, predicate, doFinish=True):
+        """Deferred counterpart of CancellationToken.waitFor."""
+
+        def raiseIfCancelled(__):
+            if not predicate():
+                self.token.raiseIfCancelled(doFinish=doFinish)
+
+        deferred = self.whenTrue(lambda: predicate() or self.token.isCancelled(doFinish=doFinish))
+        return deferred.addCallback(raiseIfCancelled)
+
+    def stateChangedCB(self):
+        """State event listener, state can be changed from any thread but barriers live in the reactor thread."""
+        reactor.callFromThread(self.checkBarriers)
+
+    def checkBarriers(self):
+        """Fire every barrier whose predicate is now True."""
+        for barrier in list(self.barriers):
+            # might have been fired already by a nested call.
+            if barrier not in self.barriers:
+                continue
+
+            predicate, deferred = barrier
+
+            try:
+                if not predicate():
+                    continue
+            except Exception:
+                self.barriers.remove(barrier)
+                deferred.errback()
+                continue
+
+            self.barriers.remove(barrier)
+            deferred.callback(None)
+
+    @defer.inlineCallbacks
+    def run(self, cmd, visit):
+        """Deferred counterpart of waitForCompletion, fires with fileIds."""
+        self.start(cmd, visit)
+
+        yield self.whenTrue(lambda: self.isFinished)
+
+        if self.storable:
+            # waiting for opdb inserts, outside the reactor.
+            frames = yield threads.deferToThread(self.store, cmd, visit)
+        else:
+            frames = []
+
+        return self.genFileIds(visit, frames)
+
+
+class DarkExposure(Exposure, exposure.DarkExposure):
+    """Deferred DarkExposure object."""
@@ -1,5 +1,3 @@
-import ics.utils.time as pfsTime
-import spsActor.utils.exception as exception
 from spsActor.utils import exposure, slitControl
 
 
@@ -21,12 +19,8 @@ class SpecModuleExposure(exposure.SpecModuleExposure):
         """Send go signal and wait for slit to be at speed."""
         # sending go signal.
         self.slitControl.goSignal = True
-
-        while not self.slitSliding:
-            if self.exp.doAbort:
-                raise exception.ExposureAborted
-
-            pfsTime.sleep.millisec()
+        # only abort interrupts the wait, finish is handled later by the shutters.
+        self.exp.token.waitFor(lambda: self.slitSliding, doFinish=False)
 
     def slitState(self, keyVar):
         """Slit state callback, call shuttersOpenCB() whenever open."""
@@ -35,6 +29,7 @@ class SpecModuleExposure(exposure.SpecModuleExposure):
         # track slit state.
         self.actor.bcast.debug(f'text="{self.specName} slitAtSpeed={atSpeed}"')
         self.slitSliding = atSpeed
+        self.exp.stateChanged.notify()
 
     def exit(self):
         """Free up all resources."""
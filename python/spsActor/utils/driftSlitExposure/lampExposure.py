@@ -20,6 +20,7 @@ class SpecModuleExposure(lampsExposure.SpecModuleExposure):
         self.actor.bcast.debug(f'text="{self.specName} slitAtSpeed={atSpeed}"')
 
         self.slitSliding = atSpeed
+        self.exp.stateChanged.notify()
 
         if self.slitSliding:
             self.slitSlidingCB()
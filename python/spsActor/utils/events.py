@@ -0,0 +1,122 @@
+import threading
+
+import spsActor.utils.exception as exception
+
+
+class StateEvent(object):
+    """Condition shared by the exposure threads and the keyword callbacks, notified on every state change.
+
+    Events can be nested, a change notified on a child event also wakes up its parents, so that a local change only
+    wakes up the threads that care about it, but exposure-wide waiters still see everything.
+    """
+
+    def __init__(self, parent=None):
+        self.condition = threading.Condition()
+        self.listeners = []
+        self.children = []
+        self.parent = parent
+
+        if parent is not None:
+            parent.children.append(self)
+
+    def addListener(self, listener):
+        """Call listener() on every state change, in the notifying thread."""
+        self.listeners.append(listener)
+
+    def wakeUp(self):
+        """Wake up every thread waiting on that event only."""
+        with self.condition:
+            self.condition.notify_all()
+
+        for listener in self.listeners:
+            listener()
+
+    def notify(self):
+        """Wake up every thread waiting for a state change, here and in the parent events."""
+        self.wakeUp()
+
+        if self.parent is not None:
+            self.parent.notify()
+
+    def broadcast(self):
+        """Wake up every thread waiting on that event and on all its children, e.g. on abort."""
+        self.wakeUp()
+
+        for child in self.children:
+            child.broadcast()
+
+    def wait(self, predicate, timeout=None):
+        """Block until predicate() is True or timeout expires, return the last predicate value."""
+        with self.condition:
+            return self.condition.wait_for(predicate, timeout=timeout)
+
+
+class CountdownLatch(object):
+    """Block until a given number of parties have counted down, whatever their outcome."""
+
+    def __init__(self, count):
+        self.count = count
+        self.condition = threading.Condition()
+
+    @property
+    def released(self):
+        return self.count <= 0
+
+    def countDown(self):
+        """Declare that one party is done."""
+        with self.condition:
+            self.count -= 1
+
+            if self.released:
+                self.condition.notify_all()
+
+    def wait(self, timeout=None):
+        """Block until every party is done or timeout expires, return True if released."""
+        with self.condition:
+            return self.condition.wait_for(lambda: self.released, timeout=timeout)
+
+
+class CancellationToken(object):
+    """Exposure-wide abort/finish request, waiters block on it together with their own go/ready condition."""
+
+    def __init__(self, stateEvent):
+        self.stateEvent = stateEvent
+        self.aborted = False
+        self.finished = False
+
+    def abort(self):
+        """Request abort, waking up every waiter."""
+        self.aborted = True
+        self.stateEvent.broadcast()
+
+    def finish(self):
+        """Request finish, waking up every waiter."""
+        self.finished = True
+        self.stateEvent.broadcast()
+
+    def isCancelled(self, doFinish=True):
+        """Return True if aborted, or finished when finish is considered as a cancellation."""
+        return self.aborted or (doFinish and self.finished)
+
+    def raiseIfCancelled(self, doFinish=True):
+        """Raise EarlyFinish or ExposureAborted if the exposure was cancelled."""
+        if doFinish and self.finished:
+            raise exception.EarlyFinish
+
+        if self.aborted:
+            raise exception.ExposureAborted
+
+    def waitFor(self, predicate, timeout=None, doFinish=True, stateEvent=None):
+        """Block until predicate() is True, raise as soon as the exposure is cancelled.
+
+        Waits on the exposure-wide event, unless a child event is given.
+        Returns the predicate value, which is only False if timeout expired.
+        """
+        stateEvent = self.stateEvent if stateEvent is None else stateEvent
+        stateEvent.wait(lambda: predicate() or self.isCancelled(doFinish=doFinish), timeout=timeout)
+
+        if predicate():
+            return True
+
+        self.raiseIfCancelled(doFinish=doFinish)
+        return False
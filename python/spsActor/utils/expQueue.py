@@ -0,0 +1,120 @@
+import itertools
+import threading
+
+
+class QueueEntry(object):
+    """Exposure request, waiting for its resources to be free."""
+
+    def __init__(self, queueId, visit, resources, expKwargs):
+        self.queueId = queueId
+        self.visit = visit
+        self.resources = resources
+        self.expKwargs = expKwargs
+        self.status = 'queued'
+
+    @property
+    def exptype(self):
+        return self.expKwargs['exptype']
+
+    def genKey(self):
+        """Generate queueEntry keyword."""
+        return f'queueEntry={self.queueId},{self.visit},{self.exptype},{self.status}'
+
+
+class ExposureQueue(object):
+    """Exposure requests enqueued by clients, dispatched in order as soon as the resources they need are free.
+
+    A queued entry blocks the following ones needing the same resources, so that entries are never starved.
+    Resources are leased when an entry is dispatched, so that a direct exposure cannot take them in the meantime.
+    """
+
+    def __init__(self, actor, dispatchFunc, leaseFunc):
+        self.actor = actor
+        self.dispatchFunc = dispatchFunc
+        self.leaseFunc = leaseFunc
+        self.entries = []
+        self.ids = itertools.count(1)
+        self.lock = threading.RLock()
+
+    @property
+    def queued(self):
+        return [entry for entry in self.entries if entry.status == 'queued']
+
+    @property
+    def running(self):
+        return [entry for entry in self.entries if entry.status == 'running']
+
+    def __contains__(self, visit):
+        return visit in [entry.visit for entry in self.entries]
+
+    def put(self, visit, resources, **expKwargs):
+        """Enqueue an exposure request and try to dispatch it right away."""
+        with self.lock:
+            entry = QueueEntry(next(self.ids), visit, resources, expKwargs)
+            self.entries.append(entry)
+
+        self.actor.bcast.inform(entry.genKey())
+        self.dispatch()
+        return entry
+
+    def remove(self, visit):
+        """Remove a queued entry, running ones need to be aborted."""
+        with self.lock:
+            for entry in self.queued:
+                if entry.visit == visit:
+                    entry.status = 'removed'
+                    self.entries.remove(entry)
+                    break
+            else:
+                return None
+
+        self.actor.bcast.inform(entry.genKey())
+        self.genStatus()
+        return entry
+
+    def lease(self, entry, busy):
+        """Lease entry resources if none of them is used by a running entry, return True if leased."""
+        return not entry.resources & busy and not self.leaseFunc(entry)
+
+    def dispatch(self):
+        """Lease and start every queued entry whose resources are free."""
+        toStart = []
+
+        with self.lock:
+            busy = set().union(*[entry.resources for entry in self.running])
+
+            for entry in self.queued:
+                if self.lease(entry, busy):
+                    entry.status = 'running'
+                    toStart.append(entry)
+
+                # queued entries are blocking the next ones as well.
+                busy |= entry.resources
+
+        for entry in toStart:
+            self.actor.bcast.inform(entry.genKey())
+            self.dispatchFunc(entry)
+
+        self.genStatus()
+
+    def exposureEnded(self, visit):
+        """Called whenever an exposure is done, remove the entry if it was queued and dispatch the next ones."""
+        with self.lock:
+            ended = [entry for entry in self.entries if entry.visit == visit and entry.status != 'queued']
+
+            for entry in ended:
+                # status is set when the exposure is done, still running means something went wrong.
+                if entry.status == 'running':
+                    entry.status = 'failed'
+
+                self.entries.remove(entry)
+
+        for entry in ended:
+            self.actor.bcast.inform(entry.genKey())
+
+        self.dispatch()
+
+    def genStatus(self, cmd=None):
+        """Generate exposureQueue keyword, number of queued and running entries."""
+        cmd = self.actor.bcast if cmd is None else cmd
+        cmd.inform(f'exposureQueue={len(self.queued)},{len(self.running)}')
@@ -1,16 +1,21 @@
+import threading
+from functools import partial
+
 import ics.utils.cmd as cmdUtils
 import ics.utils.time as pfsTime
 import spsActor.utils.exception as exception
-from actorcore.QThread import QThread
 from ics.utils.threading import singleShot
 from ics.utils.threading import threaded
 from opscore.utility.qstr import qstr
 from spsActor.utils import ccdExposure
+from spsActor.utils import events
 from spsActor.utils import hxExposure
+from spsActor.utils import illumination
 from spsActor.utils import lampsControl
 from spsActor.utils import shutters
+from spsActor.utils.camSets import CamExpSets
 from spsActor.utils.ids import SpsIds as idsUtils
-from twisted.internet import reactor
+from spsActor.utils.workers import PooledThread
 
 
 def factory(exp, cam):
@@ -23,9 +28,10 @@ def factory(exp, cam):
         raise ValueError(f'unknown arm:{cam.arm} ..')
 
 
-class SpecModuleExposure(QThread):
+class SpecModuleExposure(PooledThread):
     """Placeholder to handle spectograph module cmd threading."""
     EnuExposeTimeMargin = 5
+    wipeMargin = 1  # ccd wipes are scheduled to complete that many seconds before h4 first read.
 
     def __init__(self, exp, specNum, cams):
         self.exp = exp
@@ -36,16 +42,20 @@ class SpecModuleExposure(QThread):
         self.enuName = f'enu_{self.specName}'
         self.enuKeyVarDict = self.exp.actor.models[self.enuName].keyVarDict
 
-        QThread.__init__(self, exp.actor, self.specName)
+        PooledThread.__init__(self, exp.actor, self.specName)
+        # camera state changes only wake up this module thread, not the other modules.
+        self.stateChanged = exp.moduleStateChanged(specNum)
+        self.camSets = exp.moduleCamSets(specNum)
 
         # create underlying exposure objects.
-        self.camExp = [factory(exp, cam) for cam in cams]
+        self.camExp = [exp.camExposure(cam) for cam in cams]
 
         # creating shutter state object.
         self.shutterState = shutters.ShutterState(self)
-        self.enuKeyVarDict['shutters'].addCallback(self.shutterState.callback)
 
-        self.start()
+        # in pipelined mode, shutters might still be used by the previous visit, so only listen once wiped.
+        if not exp.doPipeline:
+            self.listenToShutters()
 
     @property
     def specName(self):
@@ -71,21 +81,26 @@ class SpecModuleExposure(QThread):
 
     @property
     def runExp(self):
-        return list(set(self.camExp) - set(self.clearedExp))
+        return self.camSets.snapshot(self.camSets.running)
 
     @property
     def clearedExp(self):
-        return [camExp for camExp in self.camExp if camExp.cleared]
+        return self.camSets.snapshot(self.camSets.cleared)
 
     @property
     def isFinished(self):
-        return all([camExp.isFinished for camExp in self.camExp])
+        return self.camSets.isFinished
 
     @property
     def syncThreadsToOpen(self):
         # if not syncSpectrograph, each sm is independent.
         return self.exp.runExp if self.exp.syncSpectrograph else self.runExp
 
+    @property
+    def syncStateChanged(self):
+        # if syncSpectrograph, other modules detectors need to be waited for too.
+        return self.exp.stateChanged if self.exp.syncSpectrograph else self.stateChanged
+
     def currently(self, state):
         """Current camExp states."""
         return [camExp.state == state for camExp in self.runExp]
@@ -96,26 +111,68 @@ class SpecModuleExposure(QThread):
         bitMask = 0 if not shutters else sum([shutter.bitMask for shutter in shutters])
         return f'0x{bitMask:x}'
 
-    def wipe(self, cmd):
-        """Wipe running CcdExposure and wait for integrating state.
-        Note that doFinish==doAbort at the beginning of integration."""
+    def hxResetDone(self):
+        """Return True when the h4 was reset, or failed to."""
+        return self.hxExposure.resetDone or self.hxExposure.timingFailure
+
+    def ccdWipeDelay(self):
+        """Return ccd wipe delay after ramp start, so that wipes complete with the h4 first read, None if unknown."""
+        firstReadDelay = self.hxExposure.expectedFirstReadDelay
+        wipeDurations = [camExp.expectedWipeDuration for camExp in self.runExp if camExp != self.hxExposure]
+
+        if firstReadDelay is None or None in wipeDurations:
+            return None
+
+        return max(0, firstReadDelay - max(wipeDurations, default=0) - SpecModuleExposure.wipeMargin)
+
+    def waitForCcdWipeTime(self, cmd):
+        """Wait for the h4 reset frame, or for the predicted ccd wipe time if it comes first."""
+        wipeDelay = self.ccdWipeDelay()
+
+        # nothing learned yet, just wait for the reset frame.
+        if wipeDelay is None:
+            self.exp.token.waitFor(self.hxResetDone, stateEvent=self.stateChanged)
+            return
+
+        # h4 might still be used by the previous visit.
+        self.exp.token.waitFor(lambda: self.hxExposure.rampCmdSent or self.hxExposure.timingFailure,
+                               stateEvent=self.stateChanged)
+        wipeAt = self.hxExposure.rampTiming.get('startRamp', 0) + wipeDelay
+        cmd.debug(f'text="{self.specName} ccd wipes scheduled {wipeDelay:.1f}s after ramp start"')
+
+        wakeUp = self.actor.scheduler.callAt(wipeAt, self.stateChanged.notify)
+        try:
+            self.exp.token.waitFor(lambda: self.hxResetDone() or pfsTime.timestamp() >= wipeAt,
+                                   stateEvent=self.stateChanged)
+        finally:
+            wakeUp.cancel()
+
+    def detectorsWiped(self):
+        """Return True when every detector that needs to be synchronised is wiped."""
+        if self.hxExposure and self.hxExposure.timingFailure:
+            return True
+
+        return all([detector.wiped for detector in self.syncThreadsToOpen])
 
-        def checkAbortSignal():
-            if self.exp.doFinish:
-                raise exception.EarlyFinish
+    def checkRampTiming(self):
+        """Raise h4 ramp timing failure if any, reset and first read timing are checked by the actor scheduler."""
+        if self.hxExposure and self.hxExposure.timingFailure:
+            raise self.hxExposure.timingFailure
 
-            if self.exp.doAbort:
-                raise exception.ExposureAborted
+    def listenToShutters(self):
+        """Start tracking shutters state."""
+        self.shutterState.attach(self.enuKeyVarDict['shutters'])
 
+    def wipe(self, cmd):
+        """Wipe running CcdExposure and wait for integrating state.
+        Note that doFinish==doAbort at the beginning of integration."""
         # Start the ramp.
         if self.hxExposure:
             self.hxExposure.ramp(cmd, expectedExptime=self.exp.exptime)
 
-            # And wait for the reset frame to start wiping ccds.
-            while self.hxExposure.state != 'reset':
-                self.hxExposure.checkResetTiming()  # check that that reset is done in timely manner.
-                checkAbortSignal()
-                pfsTime.sleep.millisec()
+            # And wait for the reset frame, or the learned timing, to start wiping ccds.
+            self.waitForCcdWipeTime(cmd)
+            self.checkRampTiming()  # check that that reset is done in timely manner.
 
         for camExp in self.runExp:
             if camExp == self.hxExposure:
@@ -123,23 +180,28 @@ class SpecModuleExposure(QThread):
             camExp.wipe(cmd)
 
         # # if one fails, it cleared itself out.
-        while not all([detector.wiped for detector in self.syncThreadsToOpen]):
-            if self.hxExposure:
-                self.hxExposure.checkFirstReadTiming()  # check that the first read is reached in timely manner.
-            pfsTime.sleep.millisec()
+        self.syncStateChanged.wait(self.detectorsWiped)
+        self.checkRampTiming()  # check that the first read is reached in timely manner.
+        self.exp.token.raiseIfCancelled()
 
-        checkAbortSignal()
+    def shuttersExposeCmd(self, shutterTime=None):
+        """Build enu shutters expose command string and time limit."""
+        # exposure time can have some overhead.
+        shutterTime = self.exp.exptime + self.exp.iisShutterOverHead if shutterTime is None else shutterTime
+        shutterMask = self.shutterMask()
+
+        cmdStr = f'shutters expose exptime={shutterTime} shutterMask={shutterMask} visit={self.exp.visit}'
+        return cmdStr, shutterTime + SpecModuleExposure.EnuExposeTimeMargin
 
     def integrate(self, cmd, shutterTime=None):
         """Integrate for both calib and regular exposure."""
-        # exposure time can have some overhead.
-        shutterTime = self.exp.exptime + self.exp.iisShutterOverHead if shutterTime is None else shutterTime
+        cmdStr, timeLim = self.shuttersExposeCmd(shutterTime)
+        cmdVar = self.exp.actor.crudeCall(cmd, actor=self.enuName, cmdStr=cmdStr, timeLim=timeLim)
 
-        shutterMask = self.shutterMask()
-        cmdVar = self.exp.actor.crudeCall(cmd, actor=self.enuName,
-                                          cmdStr=f'shutters expose exptime={shutterTime} shutterMask={shutterMask} visit={self.exp.visit}',
-                                          timeLim=shutterTime + SpecModuleExposure.EnuExposeTimeMargin)
+        return self.parseShuttersReply(cmdVar)
 
+    def parseShuttersReply(self, cmdVar):
+        """Retrieve exptime and dateobs from enu shutters expose reply."""
         if cmdVar.didFail:
             raise exception.ShuttersFailed(self.specName, cmdUtils.interpretFailure(cmdVar))
 
@@ -156,8 +218,7 @@ class SpecModuleExposure(QThread):
         for camExp in self.runExp:
             camExp.read(cmd, visit=visit, exptime=exptime, dateobs=dateobs)
 
-        while not all(self.currently(state='idle')):
-            pfsTime.sleep.millisec()
+        self.stateChanged.wait(lambda: all(self.currently(state='idle')))
 
     @threaded
     def expose(self, cmd, visit):
@@ -165,6 +226,7 @@ class SpecModuleExposure(QThread):
 
         try:
             self.wipe(cmd)
+            self.listenToShutters()
             self.postWipeFunc()
             exposeStart = pfsTime.Time.now()
             try:
@@ -184,6 +246,10 @@ class SpecModuleExposure(QThread):
             self.exp.abort(cmd, reason=str(e))
             return
 
+        # exposure was discarded, detectors might still be clearing while shutters are already closed.
+        if self.exp.doAbort:
+            return
+
         self.read(cmd, visit=visit, exptime=exptime, dateobs=dateobs)
 
     def shuttersOpenCB(self):
@@ -202,6 +268,15 @@ class SpecModuleExposure(QThread):
         if self.hxExposure:
             self.hxExposure.declareFinalRead()
 
+    def shutterTimingsReceived(self):
+        """Return True if enu shutterTimings keyword was generated for this visit."""
+        try:
+            lastVisit, startedAt, openAt, endedAt, closedAt = self.enuKeyVarDict['shutterTimings'].getValue()
+        except (TypeError, ValueError):
+            return False
+
+        return lastVisit == self.exp.visit
+
     def iisIlluminated(self):
         """Check if iis was illuminated during that visit."""
         iisKeyVarDict = self.actor.models['iis'].keyVarDict
@@ -225,9 +300,22 @@ class SpecModuleExposure(QThread):
         return illuminated
 
     def clearExposure(self, cmd):
-        """Clear all running CcdExposure."""
-        for camExp in self.runExp:
+        """Clear all running camera exposures at once, return when they are all cleared."""
+        runExp = self.runExp
+        latch = events.CountdownLatch(len(runExp))
+
+        for camExp in runExp:
+            self.clearCamExposure(cmd, camExp, latch)
+
+        latch.wait(timeout=ccdExposure.CcdExposure.clearTimeLim + SpecModuleExposure.EnuExposeTimeMargin)
+
+    @singleShot
+    def clearCamExposure(self, cmd, camExp, latch):
+        """Clear a single camera exposure, so that cameras are not cleared one after the other."""
+        try:
             camExp.clearExposure(cmd)
+        finally:
+            latch.countDown()
 
     def abort(self, cmd):
         """discarding exposure."""
@@ -249,18 +337,22 @@ class SpecModuleExposure(QThread):
         Notes:
         ------
         - If the shutters were not open or if doDiscard is True, the exposure is discarded by clearing the CCDs
-          and stopping the ramp.
-        - If the exposure was discarded, when the shutter command returns, the read command will be skipped.
+          and stopping the ramp, while the shutters are being closed.
+        - If the exposure was aborted, when the shutter command returns, the read command will be skipped.
         - The finish operation only completes when the shutters are fully closed.
         """
+        if self.shutterState.isOpen:
+            # The finish operation only completes when the shutters are closed.
+            self.finishShutters(cmd)
+
         # If shutters were not open or doDiscard is forced, discard CCDs and stop the ramp.
         if not self.shutterState.wasOpen or doDiscard:
             self.clearExposure(cmd)
 
-        if self.shutterState.isOpen:
-            # It the exposure was discarded, when the shutter command returns, the read command will be skipped.
-            # The finish operation only completes when the shutters are closed.
-            self.exp.actor.safeCall(cmd, actor=self.enuName, cmdStr='exposure finish')
+    @singleShot
+    def finishShutters(self, cmd):
+        """Command shutters to finish the exposure, in parallel with detectors clearing."""
+        self.exp.actor.safeCall(cmd, actor=self.enuName, cmdStr='exposure finish')
 
     def postWipeFunc(self):
         """Placeholder for a function call after wipe."""
@@ -269,13 +361,13 @@ class SpecModuleExposure(QThread):
     def exit(self):
         """Free up all resources."""
         # remove shutters callback.
-        self.enuKeyVarDict['shutters'].removeCallback(self.shutterState.callback)
+        self.shutterState.detach()
 
         for camExp in self.camExp:
             camExp.exit()
 
         self.camExp.clear()
-        QThread.exit(self)
+        PooledThread.exit(self)
 
 
 class Exposure(object):
@@ -285,9 +377,13 @@ class Exposure(object):
     # pulse to absorb the iisActor go-cmd round-trip. Trailing edge is handled by
     # LampsControl.start calling exp.finish(cmd) once the pulse returns.
     iisGoMargin = 10
+    # Completion is notified by the cameras, this is only a safety net against a missed notification.
+    completionCheckPeriod = 1
+    # opdb inserts are submitted along the exposure, this is how long fileIds wait for the last ones.
+    storeTimeout = 30
 
     def __init__(self, actor, visit, exptype, exptime, cams, metadata=None, doIIS=False, doTest=False, blueWindow=False,
-                 redWindow=False, expTimeOverHead=0, **kwargs):
+                 redWindow=False, expTimeOverHead=0, doPipeline=False, **kwargs):
         self.actor = actor
         self.visit = visit
         self.coreExpType = exptype  # save the actual exptype first
@@ -295,6 +391,8 @@ class Exposure(object):
         self.exptime = exptime
         self.metadata = metadata
         self.doIIS = doIIS
+        # pipelined exposure wait for the previous visit to hand over each camera, instead of assuming they are free.
+        self.doPipeline = doPipeline
 
         # Define how ccds are wiped and read, for windowing purposes.
         self.wipeFlavour, self.readFlavour = ccdExposure.CcdExposure.defineCCDControl(blueWindow, redWindow)
@@ -304,9 +402,25 @@ class Exposure(object):
         self.rampConfig = self.exposureConfig['ramp']
 
         self.cmd = None
-        self.doAbort = False
-        self.doFinish = False
         self.didGenShutterKey = dict(open=False, close=False)
+        # cameras whose sps_exposure row was inserted in opdb, and pending inserts.
+        self.storedCams = []
+        self.pendingInserts = []
+        self.visitStored = False
+        self.storeLock = threading.Lock()
+        # time of the first abort request, and time it took to clear every camera.
+        self.abortRequestedAt = None
+        self.abortLatency = None
+        self.abortLock = threading.Lock()
+        # notified by camera exposures whenever they become storable or cleared.
+        self.stateChanged = events.StateEvent()
+        # per spectrograph module events, so that a module only wakes up on its own camera state changes.
+        self.moduleEvents = dict()
+        # camera exposures sorted by state, exposure-wide and per spectrograph module.
+        self.camSets = CamExpSets()
+        self.moduleSets = dict()
+        # abort/finish request, waking up any thread waiting on the exposure state.
+        self.token = events.CancellationToken(self.stateChanged)
 
         self.failures = exception.Failures()
         # central IIS lamp thread, instantiated once for the whole exposure.
@@ -320,25 +434,33 @@ class Exposure(object):
     def exposureConfig(self):
         return self.actor.actorConfig['exposure']
 
+    @property
+    def doAbort(self):
+        return self.token.aborted
+
+    @property
+    def doFinish(self):
+        return self.token.finished
+
     @property
     def camExp(self):
-        return sum([th.camExp for th in self.smThreads], [])
+        return self.camSets.all
 
     @property
     def clearedExp(self):
-        return [camExp for camExp in self.camExp if camExp.cleared]
+        return self.camSets.snapshot(self.camSets.cleared)
 
     @property
     def runExp(self):
-        return list(set(self.camExp) - set(self.clearedExp))
+        return self.camSets.snapshot(self.camSets.running)
 
     @property
     def isFinished(self):
-        return all([th.isFinished for th in self.smThreads])
+        return self.camSets.isFinished
 
     @property
     def storable(self):
-        return any([camExp.storable for camExp in self.camExp])
+        return bool(self.camSets.storable)
 
     @property
     def iisThreads(self):
@@ -356,36 +478,150 @@ class Exposure(object):
         """Create underlying specModuleExposure threads."""
         return [self.SpecModuleExposureClass(self, smId, cams) for smId, cams in idsUtils.splitCamPerSpec(cams).items()]
 
+    def camExposure(self, cam):
+        """Create camera exposure object."""
+        return self.track(factory(self, cam))
+
+    def track(self, camExp):
+        """Start tracking camera exposure state, exposure-wide and within its spectrograph module."""
+        self.camSets.add(camExp)
+        self.moduleCamSets(camExp.cam.specNum).add(camExp)
+        return camExp
+
+    def queueUp(self):
+        """Queue up for every camera, whatever the mode, so that a pipelined visit can wait for this one.
+
+        Only done once the exposure is started, so that a failed construction never leaves a ghost owner behind.
+        """
+        for camExp in self.camExp:
+            self.actor.cameraHandover.request(camExp)
+
+    def waitForCamera(self, camExp):
+        """In pipelined mode, wait for the previous visit to hand the camera over."""
+        if not self.doPipeline:
+            return
+
+        self.token.waitFor(lambda: self.actor.cameraHandover.isOwner(camExp), stateEvent=camExp.stateChanged)
+
+    def ownsCamera(self, camExp):
+        """Return True if the camera can be commanded by this visit."""
+        return not self.doPipeline or self.actor.cameraHandover.isOwner(camExp)
+
+    def releaseCamera(self, camExp):
+        """Hand the camera over to the next visit."""
+        self.actor.cameraHandover.release(camExp)
+
+    def moduleStateChanged(self, specNum):
+        """Return spectrograph module state event, notifying the exposure-wide one as well."""
+        if specNum not in self.moduleEvents:
+            self.moduleEvents[specNum] = events.StateEvent(parent=self.stateChanged)
+
+        return self.moduleEvents[specNum]
+
+    def moduleCamSets(self, specNum):
+        """Return spectrograph module camera exposure sets."""
+        if specNum not in self.moduleSets:
+            self.moduleSets[specNum] = CamExpSets()
+
+        return self.moduleSets[specNum]
+
     def waitForCompletion(self, cmd, visit):
         """Create underlying specModuleExposure threads."""
 
-        def genFileIds(visit, frames):
-            return f"""fileIds={visit},{qstr(';'.join(frames))},0x{idsUtils.getMask(frames):04x}"""
-
         self.start(cmd, visit)
+        return self.collect(cmd, visit)
 
-        while not self.isFinished:
-            pfsTime.sleep.millisec()
+    def collect(self, cmd, visit):
+        """Wait for every camera to be finished, then generate fileIds of the stored cameras."""
+        self.waitUntilFinished()
 
         if self.storable:
             frames = self.store(cmd, visit)
         else:
             frames = []
 
-        return genFileIds(visit, frames)
+        return self.genFileIds(visit, frames)
+
+    def waitUntilFinished(self):
+        """Block until every camera is finished."""
+        while not self.stateChanged.wait(lambda: self.isFinished, timeout=Exposure.completionCheckPeriod):
+            # cached sets are only updated on notification, rebuild them from the cameras in case one was missed.
+            for camExp in list(self.camExp):
+                self.camStateChanged(camExp)
+
+    def cameraRead(self, camExp):
+        """Called by camera exposures as soon as they are read, publish and store that camera right away."""
+        # camera state still needs to be updated by the caller, otherwise the exposure would never finish.
+        try:
+            self.genCameraFileIds(camExp)
+        except Exception as e:
+            self.actor.logger.warning(f'{camExp.cam} failed to generate cameraFileIds : {e}')
+
+        # a publishing error must never prevent the opdb row.
+        try:
+            self.storeCamera(camExp)
+        except Exception as e:
+            self.actor.logger.warning(f'{camExp.cam} failed to store read : {e}')
+
+    def genCameraFileIds(self, camExp):
+        """Generate cameraFileIds keyword as soon as a camera is read, not waiting for the others."""
+        cmd = self.actor.bcast if self.cmd is None else self.cmd
+        cmd.inform(f'cameraFileIds={self.visit},{camExp.cam},{qstr(camExp.filepath)}')
+
+    @staticmethod
+    def genFileIds(visit, frames):
+        """Generate fileIds keyword."""
+        return f"""fileIds={visit},{qstr(';'.join(frames))},0x{idsUtils.getMask(frames):04x}"""
+
+    def camStateChanged(self, camExp):
+        """Called by camera exposures whenever they become storable or cleared."""
+        self.camSets.update(camExp)
+        self.moduleCamSets(camExp.cam.specNum).update(camExp)
+
+        # camera is not needed anymore, the next visit can start using it.
+        if camExp.isFinished:
+            self.releaseCamera(camExp)
+
+        # cameras might be cleared concurrently, keyword is generated only once.
+        with self.abortLock:
+            if self.abortRequestedAt and self.abortLatency is None and self.isFinished:
+                self.genAbortLatency()
+
+        camExp.stateChanged.notify()
+
+    def genAbortLatency(self):
+        """Generate abortLatency keyword, time from the abort request to the last camera being cleared."""
+        self.abortLatency = round(pfsTime.timestamp() - self.abortRequestedAt, 3)
+        cmd = self.actor.bcast if self.cmd is None else self.cmd
+        cmd.inform(f'abortLatency={self.visit},{self.abortLatency}')
 
     def abort(self, cmd, reason="ExposureAborted()"):
         """ Abort current exposure."""
         # just call finish.
-        self.doAbort = True
         self.failures.add(reason)
 
+        with self.abortLock:
+            if self.abortRequestedAt is None:
+                self.abortRequestedAt = pfsTime.timestamp()
+
+        self.token.abort()
+
         for thread in self.threads:
-            thread.abort(cmd)
+            # spectrograph modules abort in their own thread already.
+            if thread in self.smThreads:
+                thread.abort(cmd)
+            # lamps and slit stop commands are blocking, do not wait for one before aborting the next.
+            else:
+                self.abortThread(cmd, thread)
+
+    @singleShot
+    def abortThread(self, cmd, thread):
+        """Abort lamps or slit thread."""
+        thread.abort(cmd)
 
     def finish(self, cmd):
         """Finish current exposure."""
-        self.doFinish = True
+        self.token.finish()
 
         for thread in self.threads:
             thread.finish(cmd)
@@ -396,6 +632,8 @@ class Exposure(object):
         if not self.cmd:
             self.cmd = cmd
 
+        self.queueUp()
+
         # start lamp thread if any.
         for thread in self.lampsThreads:
             thread.start(cmd)
@@ -417,18 +655,19 @@ class Exposure(object):
             if lightSource == 'pfi':
                 self.cmd.inform(f'pfiShutters={state}')
 
-            # Generate fiberIllumination keyword, e.g. was IIS used etc...
+            # Generate fiberIllumination keyword, e.g. was IIS used etc... as soon as keywords are received.
             if state == 'close':
-                reactor.callLater(1, self.genIlluminationStatus)
+                illumination.IlluminationStatus(self).start()
 
-    def genIlluminationStatus(self):
+    def genIlluminationStatus(self, specModules=None):
         """Generate fiberIllumination keyword using a single unsigned integer."""
+        specModules = self.smThreads if specModules is None else specModules
 
         fiberIllumination = 0  # Initialize an 8-bit integer (all bits set to 0).
 
         for iSpec in range(4):
             specNum = iSpec + 1
-            specModule = [thread for thread in self.smThreads if thread.specNum == specNum]
+            specModule = [thread for thread in specModules if thread.specNum == specNum]
 
             # No data associated with this spectrograph module.
             if not specModule:
@@ -471,17 +710,69 @@ class Exposure(object):
 
     def exit(self):
         """Free up all resources."""
+        for camExp in self.camExp:
+            self.releaseCamera(camExp)
+
         for thread in self.threads:
             thread.exit()
 
         self.smThreads.clear()
 
+    def storeVisit(self, cmd, visit):
+        """Store Exposure in sps_visit table in opdb database, without blocking."""
+        self.actor.opdbStore.insert(cmd, 'sps_visit', pfs_visit_id=int(visit), exp_type=str(self.exptype))
+
+    def storeCamera(self, camExp):
+        """Store camera exposure in sps_exposure table in opdb database, without blocking."""
+        try:
+            camName, row = camExp.exposureRow()
+        except Exception as e:
+            self.actor.logger.warning(f'{camExp.cam} could not build sps_exposure row : {e}')
+            return
+
+        with self.storeLock:
+            # sps_visit row goes with the first camera read, so that aborted visits are not stored.
+            if not self.visitStored:
+                self.visitStored = True
+                self.storeVisit(self.cmd, self.visit)
+
+        self.insertRow(self.cmd, row, insertedFunc=lambda: self.storedCams.append(camName))
+
+    def insertRow(self, cmd, row, insertedFunc):
+        """Submit sps_exposure row without blocking, insertedFunc is called only if the row was actually inserted."""
+        inserted = events.CountdownLatch(1)
+
+        with self.storeLock:
+            self.pendingInserts.append(inserted)
+
+        def rowInserted(success):
+            try:
+                if success:
+                    insertedFunc()
+            finally:
+                inserted.countDown()
+
+        self.actor.opdbStore.insert(cmd, 'sps_exposure', callback=rowInserted, **row)
+
+    def waitForInserts(self, cmd):
+        """Wait for every submitted sps_exposure row to be inserted, or for storeTimeout to expire."""
+        deadline = pfsTime.timestamp() + Exposure.storeTimeout
+
+        with self.storeLock:
+            pendingInserts = list(self.pendingInserts)
+
+        for inserted in pendingInserts:
+            if not inserted.wait(timeout=max(deadline - pfsTime.timestamp(), 0)):
+                cmd.warn(f'text="opdb inserts for visit:{self.visit} did not complete after {Exposure.storeTimeout}s"')
+                break
+
     def store(self, cmd, visit):
-        """Store Exposure in sps_visit table in opdb database."""
-        self.actor.insert('sps_visit', pfs_visit_id=int(visit), exp_type=str(self.exptype), cmd=cmd)
+        """Wait for pending sps_exposure inserts, rows were already submitted as soon as each camera was read.
 
-        frames = [camExp.store() for camExp in self.camExp]
-        return list(filter(None, frames))
+        Return the cameras which were actually inserted.
+        """
+        self.waitForInserts(cmd)
+        return list(self.storedCams)
 
 
 class DarkExposure(Exposure):
@@ -490,14 +781,97 @@ class DarkExposure(Exposure):
     def __init__(self, *args, **kwargs):
         Exposure.__init__(self, *args, **kwargs)
 
-    @property
-    def camExp(self):
-        return self.smThreads
-
     @property
     def lampsThreads(self):
         return []
 
     def instantiate(self, cams):
         """Create underlying CcdExposure threads object."""
-        return [factory(self, cam) for cam in cams]
+        return [self.camExposure(cam) for cam in cams]
+
+
+class DarkSet(DarkExposure):
+    """Set of bias/dark exposures, reusing the same camera exposure objects for every visit.
+
+    opdb rows are inserted in the background as soon as each visit is acquired.
+    With doSingleRamp, NIR darks are carved from a single ramp instead of one ramp per visit.
+    """
+
+    def __init__(self, actor, visits, *args, doSingleRamp=False, **kwargs):
+        # needed to create camera exposures.
+        self.visits = visits
+        self.doSingleRamp = doSingleRamp
+
+        DarkExposure.__init__(self, actor, visits[0], *args, **kwargs)
+        # cameras actually inserted in opdb for each visit, and rows which were not submitted yet.
+        self.frames = dict()
+        self.rows = []
+
+    def camExposure(self, cam):
+        """Create camera exposure object, NIR darks can share the same ramp."""
+        if self.doSingleRamp and cam.arm == 'n' and self.coreExpType == 'dark':
+            return self.track(hxExposure.HxRampSplit(self, cam))
+
+        return DarkExposure.camExposure(self, cam)
+
+    def storeVisit(self, cmd, visit):
+        """Visits are stored once acquired, see flush."""
+        pass
+
+    def storeCamera(self, camExp):
+        """Visits are stored once acquired, see flush."""
+        pass
+
+    def nextVisit(self, visit):
+        """Reset camera exposures, they queue up again when the next visit starts."""
+        self.visit = visit
+
+        for camExp in self.camExp:
+            camExp.reset()
+            self.camStateChanged(camExp)
+
+    def keepRows(self, visit):
+        """Keep sps_exposure rows for the visit that was just read."""
+        self.frames[visit] = []
+
+        for camExp in self.camExp:
+            if not camExp.storable:
+                continue
+
+            camName, row = camExp.exposureRow()
+            self.rows.append((visit, camName, row))
+
+    def flush(self, cmd):
+        """Submit collected rows to opdb without blocking, sps_visit first, rows are inserted in order."""
+        rows, self.rows = self.rows, []
+        storedVisits = set()
+
+        for visit, camName, row in rows:
+            if visit not in storedVisits:
+                storedVisits.add(visit)
+                Exposure.storeVisit(self, cmd, visit)
+
+            self.insertRow(cmd, row, insertedFunc=partial(self.frames[visit].append, camName))
+
+    def run(self, cmd):
+        """Acquire every visit, stopping on finish/abort or failure, return fileIds for each visit."""
+        try:
+            for visit in self.visits:
+                if self.token.isCancelled() or self.failures:
+                    break
+
+                if visit != self.visit:
+                    self.nextVisit(visit)
+
+                self.start(cmd, visit)
+                self.waitUntilFinished()
+                self.keepRows(visit)
+                # rows are inserted in the background while the next visit is acquired.
+                self.flush(cmd)
+
+        finally:
+            # whatever happened, every visit acquired so far is stored.
+            self.flush(cmd)
+            self.waitForInserts(cmd)
+
+        return [self.genFileIds(visit, frames) for visit, frames in self.frames.items()]
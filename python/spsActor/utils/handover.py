@@ -0,0 +1,49 @@
+import threading
+from collections import deque
+
+
+class CameraHandover(object):
+    """Keep track of which visit owns each camera, in order of arrival.
+
+    Every exposure queues up for its cameras when started, and hands each of them over as soon as it is done with it,
+    so that a pipelined exposure can start wiping a camera while the previous visit is still reading the others.
+    """
+
+    def __init__(self):
+        self.queues = dict()
+        self.lock = threading.Lock()
+
+    def request(self, camExp):
+        """Queue camera exposure behind the visits already using that camera, if not queued already."""
+        with self.lock:
+            queue = self.queues.setdefault(str(camExp.cam), deque())
+
+            if camExp not in queue:
+                queue.append(camExp)
+
+    def isFree(self, cam):
+        """Return True if no visit is using or waiting for that camera."""
+        with self.lock:
+            return not self.queues.get(str(cam))
+
+    def isOwner(self, camExp):
+        """Return True if that camera exposure is the first in line."""
+        with self.lock:
+            queue = self.queues.get(str(camExp.cam))
+            return bool(queue) and queue[0] is camExp
+
+    def release(self, camExp):
+        """Hand the camera over to the next visit in line, if any."""
+        with self.lock:
+            queue = self.queues.get(str(camExp.cam), deque())
+
+            if camExp not in queue:
+                return
+
+            wasOwner = queue[0] is camExp
+            queue.remove(camExp)
+            nextOwner = queue[0] if queue and wasOwner else None
+
+        # wake up the next visit waiting for that camera.
+        if nextOwner is not None:
+            nextOwner.stateChanged.notify()
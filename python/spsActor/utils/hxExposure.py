@@ -1,13 +1,15 @@
 import os
+import threading
 
 import ics.utils.cmd as cmdUtils
 import ics.utils.time as pfsTime
 import numpy as np
 import spsActor.utils.exception as exception
-from actorcore.QThread import QThread
 from ics.utils.threading import singleShot
 from ics.utils.threading import threaded
+from opscore.utility.qstr import qstr
 from spsActor.utils.ids import SpsIds as idsUtils
+from spsActor.utils.workers import PooledThread
 
 
 def getExposureInfo(filepath):
@@ -20,7 +22,7 @@ def getExposureInfo(filepath):
     return visit, specNum, armNum
 
 
-class HxExposure(QThread):
+class HxExposure(PooledThread):
     # timeout setting.
     """Placeholder to handle hxActor cmd threading."""
     rampTimingOverhead = 15  # 5 sec has not proven to be long enough.
@@ -56,27 +58,19 @@ class HxExposure(QThread):
         self.cam = cam
         self.hx = f'hx_{cam}'
 
-        QThread.__init__(self, self.exp.actor, self.hx)
-        QThread.start(self)
+        PooledThread.__init__(self, self.exp.actor, self.hx)
 
-        self.doFinalize = False
-        self.clearASAP = False
-        self.waitForRampCmdReturn = True
+        # ramp timing checks are fired by the actor scheduler, failure is raised later by the module thread.
+        self.timingChecks = []
+        # abortRamp and rampCmd need to agree on whether the ramp command is sent.
+        self.rampLock = threading.Lock()
+        # only wakes up the threads of that spectrograph module, and the exposure-wide waiters.
+        self.stateChanged = exp.moduleStateChanged(cam.specNum)
 
-        self.wipedAt = None
-        self.rampVar = None
-        self.readVar = None
-        self.rampTiming = dict(maxResetEndTime=np.inf)
-
-        # be nice and initialize those variables
-        self.time_exp_end = None
-        self.exptime = None
-        self.dateobs = None
-
-        self.states = ['none']
         self.readTime = float(exp.actor.models[self.hx].keyVarDict['readTime'].getValue())
         # differentiating between the original number of read (nRead0) and current number of read(nRead).
-        self.nRead = self.nRead0 = nRead(exp)
+        self.nRead0 = nRead(exp)
+        self.reset()
 
         # add callback for shutters state, useful to fire process asynchronously.
         self.hxRead = exp.actor.models[self.hx].keyVarDict['hxread']
@@ -95,9 +89,38 @@ class HxExposure(QThread):
     def exptype(self):
         return self.exp.exptype
 
+    def reset(self):
+        """Reset ramp state, so that the same object can be used for the next visit."""
+        for timingCheck in self.timingChecks:
+            timingCheck.cancel()
+
+        self.doFinalize = False
+        self.clearASAP = False
+        self.discarded = False
+        self.waitForRampCmdReturn = True
+
+        self.wipedAt = None
+        self.rampVar = None
+        self.readVar = None
+        self.rampTiming = dict(maxResetEndTime=np.inf)
+        self.timingChecks = []
+        self.timingFailure = None
+
+        # be nice and initialize those variables
+        self.time_exp_end = None
+        self.exptime = None
+        self.dateobs = None
+
+        self.states = ['none']
+        self.nRead = self.nRead0
+
     @property
     def storable(self):
-        return self.readVar is not None
+        return self.readVar is not None and not self.discarded
+
+    @property
+    def filepath(self):
+        return self.readVar.getValue(doRaise=False)
 
     @property
     def isFinished(self):
@@ -107,6 +130,18 @@ class HxExposure(QThread):
     def cleared(self):
         return self.clearASAP and (self.rampVar is not None or not self.waitForRampCmdReturn)
 
+    @property
+    def rampCmdSent(self):
+        return 'startRamp' in self.rampTiming
+
+    @property
+    def expectedFirstReadDelay(self):
+        return self.actor.timingModel.predict(f'{self.hx}.firstRead')
+
+    @property
+    def resetDone(self):
+        return 'reset' in self.states
+
     @property
     def firstReadDone(self):
         return 'integrating' in self.states
@@ -143,8 +178,9 @@ class HxExposure(QThread):
         Raises:
         exception.HxRampFailed: If the state is not 'reset' and the reset duration has exceeded the limit.
         """
-        if self.state != 'reset' and pfsTime.timestamp() > self.rampTiming['maxResetEndTime']:
+        if not self.resetDone and pfsTime.timestamp() > self.rampTiming['maxResetEndTime']:
             self.waitForRampCmdReturn = False
+            self.exp.camStateChanged(self)
             raise exception.HxRampFailed(self.hx,
                                          f'was not reset after {self.rampTiming["maxResetDuration"]} seconds')
 
@@ -157,9 +193,30 @@ class HxExposure(QThread):
         """
         if not self.firstReadDone and pfsTime.timestamp() > self.rampTiming['maxFirstReadEndTime']:
             self.waitForRampCmdReturn = False
+            self.exp.camStateChanged(self)
             raise exception.HxRampFailed(self.hx,
                                          f'did not reach first read after {self.rampTiming["maxFirstReadDuration"]} seconds')
 
+    def scheduleTimingChecks(self):
+        """Register reset and first read timing checks with the actor scheduler."""
+        scheduler = self.actor.scheduler
+        self.timingChecks = [scheduler.callAt(self.rampTiming['maxResetEndTime'],
+                                              self.timingCheck, self.checkResetTiming),
+                             scheduler.callAt(self.rampTiming['maxFirstReadEndTime'],
+                                              self.timingCheck, self.checkFirstReadTiming)]
+
+    def timingCheck(self, check):
+        """Scheduled timing check, keep the failure and wake up the module thread."""
+        # ramp command already returned, nothing to check anymore.
+        if self.rampVar is not None:
+            return
+
+        try:
+            check()
+        except exception.HxRampFailed as e:
+            self.timingFailure = e
+            self.stateChanged.notify()
+
     def hxReadCB(self, keyVar):
         """H4 read callback, called at the end the read."""
         visit, nRamp, nGroup, nRead = keyVar.getValue(doRaise=False)
@@ -173,15 +230,20 @@ class HxExposure(QThread):
 
         if nGroup == 0:
             self.states.append('reset')
+            self.learnRampTiming('reset')
 
         # pretending this is a ccd.
         elif nGroup == 1 and nRead == 1:
             self.wipedAt = pfsTime.timestamp()
             self.states.append('integrating')
+            self.learnRampTiming('firstRead')
 
         elif nGroup == 1 and nRead == self.nRead:
             self.states.append('idle')
 
+        # wake up threads waiting on wipe/read barriers.
+        self.stateChanged.notify()
+
         # finishRamp(doStop=True) already sent from finishASAP.
         if self.clearASAP:
             return
@@ -197,6 +259,14 @@ class HxExposure(QThread):
             self._finishRamp(self.exp.cmd, doStop=doStop)
             self.doFinalize = False
 
+    def learnRampTiming(self, step):
+        """Learn the delay between the ramp command and that ramp step."""
+        # ramp was started by someone else.
+        if not self.rampCmdSent:
+            return
+
+        self.actor.timingModel.update(f'{self.hx}.{step}', pfsTime.timestamp() - self.rampTiming['startRamp'])
+
     def newFileNameCB(self, keyVar):
         """H4 callback when filename gets generated."""
         filepath = keyVar.getValue(doRaise=False)
@@ -225,18 +295,67 @@ class HxExposure(QThread):
 
         self.readVar = keyVar
 
+        if not self.discarded:
+            self.exp.cameraRead(self)
+
+        self.exp.camStateChanged(self)
+
     def finishRampASAP(self, cmd):
-        """Finish ramp as soon as possible."""
+        """Finish ramp as soon as possible, or right away if the exposure is aborted."""
+        if self.exp.doAbort:
+            return self.abortRamp(cmd)
+
         # meaning shutters has been used, ramp will already be told to finish at next read.
         if self.doFinalize or self.clearASAP:
             return
 
         # whenever the ramp command returns, exposure is considered cleared.
         self.clearASAP = True
+
+        # h4 was never handed over, ramp was not even started.
+        if not self.exp.ownsCamera(self):
+            self.waitForRampCmdReturn = False
+            self.exp.camStateChanged(self)
+            return
+
+        self.exp.camStateChanged(self)
         return self._finishRamp(self.exp.cmd, doStop=True)
 
-    def _ramp(self, cmd, expectedExptime=0):
+    def abortRamp(self, cmd):
+        """Stop the ramp without waiting for a read boundary, data is discarded and the h4 released on ramp return."""
+        with self.rampLock:
+            if self.discarded:
+                return
+
+            # stopRamp was already sent, or the h4 was never handed over.
+            doStop = not self.clearASAP and self.rampCmdSent and self.rampVar is None
+
+            self.discarded = True
+            self.clearASAP = True
+            self.doFinalize = False
+            # h4 is still busy until the ramp command returns, the next visit cannot use it before that.
+            # if the ramp was never sent, it will not be anymore.
+            if not self.rampCmdSent:
+                self.waitForRampCmdReturn = False
+
+        for timingCheck in self.timingChecks:
+            timingCheck.cancel()
+
+        if doStop:
+            self._finishRamp(self.exp.cmd, doStop=True)
+
+        self.exp.camStateChanged(self)
+
+    def _ramp(self, cmd, expectedExptime=0, doCheckTiming=False):
         """Send h4 ramp command and handle reply."""
+        cmdStr, timeLim = self.rampCmd(expectedExptime=expectedExptime, doCheckTiming=doCheckTiming)
+        # module thread might be waiting for the ramp to start, to schedule the ccd wipes.
+        self.stateChanged.notify()
+        rampVar = self.actor.crudeCall(cmd, actor=self.hx, cmdStr=cmdStr, timeLim=timeLim)
+        self.rampReply(rampVar)
+
+    def rampCmd(self, expectedExptime=0, doCheckTiming=False):
+        """Calculate ramp timing and build ramp command string and time limit."""
         cmdParams = dict(nread=self.nRead0, visit=self.exp.visit,
                          pfsDesign=self.exp.parsePfsDesign(),
                          metadata=self.exp.parseMetadata(),
@@ -244,11 +363,23 @@ class HxExposure(QThread):
         if expectedExptime:
             cmdParams["expectedExptime"] = expectedExptime
 
-        # calculate time limit for reset time and wipe time.
-        self.calculateRampTiming()
+        with self.rampLock:
+            # exposure was aborted before the h4 was even handed over.
+            if self.discarded:
+                raise exception.ExposureAborted()
+
+            # calculate time limit for reset time and wipe time, ramp is considered sent from now on.
+            self.calculateRampTiming()
+
+        if doCheckTiming:
+            self.scheduleTimingChecks()
 
-        self.rampVar = self.actor.crudeCall(cmd, actor=self.hx, cmdStr=cmdUtils.parse('ramp', **cmdParams),
-                                            timeLim=(self.nRead0 + 2) * self.readTime + 90)
+        return cmdUtils.parse('ramp', **cmdParams), (self.nRead0 + 2) * self.readTime + 90
+
+    def rampReply(self, rampVar):
+        """Handle ramp reply."""
+        self.rampVar = rampVar
+        self.exp.camStateChanged(self)
 
         if self.rampVar.didFail:
             raise exception.HxRampFailed(self.hx, cmdUtils.interpretFailure(self.rampVar))
@@ -260,7 +391,8 @@ class HxExposure(QThread):
     def ramp(self, cmd, expectedExptime):
         """Start h4 ramp."""
         try:
-            self._ramp(cmd, expectedExptime=expectedExptime)
+            self.exp.waitForCamera(self)
+            self._ramp(cmd, expectedExptime=expectedExptime, doCheckTiming=True)
         except Exception as e:
             self.handleRampFailed(cmd, reason=str(e))
 
@@ -272,6 +404,7 @@ class HxExposure(QThread):
             return
 
         try:
+            self.exp.waitForCamera(self)
             self._ramp(cmd)
         except Exception as e:
             self.handleRampFailed(cmd, reason=str(e))
@@ -294,14 +427,16 @@ class HxExposure(QThread):
         if self.rampVar and self.rampVar.didFail:
             return
 
+        cmdVar = self.actor.crudeCall(cmd, actor=self.hx, cmdStr=self.finishRampCmd(doStop), timeLim=60)
+        self.actor.logger.info(f'{self.hx} ramp finish didFail({cmdVar.didFail})')
+
+    def finishRampCmd(self, doStop):
+        """Build ramp finish command string."""
         exptime = f'exptime={self.exptime} ' if self.exptime else ''
         obstime = f'obstime={self.dateobs} ' if self.dateobs else ''
         stopRamp = 'stopRamp' if doStop else ''
         # parsing arguments.
-        cmdStr = f'ramp finish {exptime}{obstime}{stopRamp}'.strip()
-
-        cmdVar = self.actor.crudeCall(cmd, actor=self.hx, cmdStr=cmdStr, timeLim=60)
-        self.actor.logger.info(f'{self.hx} ramp finish didFail({cmdVar.didFail})')
+        return f'ramp finish {exptime}{obstime}{stopRamp}'.strip()
 
     def keepShutterKeys(self, cmd, visit, dateobs, exptime):
         """Keep exposure info from the shutters."""
@@ -309,11 +444,8 @@ class HxExposure(QThread):
         self.exptime = round(exptime, 3)
         self.time_exp_end = pfsTime.timestamp()
 
-    def store(self):
-        """Store in sps_exposure in opDB database."""
-        if not self.storable:
-            return
-
+    def exposureRow(self):
+        """Return camera name and sps_exposure row."""
         filepath = self.readVar.getValue(doRaise=False)
         visit, specNum, armNum = getExposureInfo(filepath)
 
@@ -326,18 +458,141 @@ class HxExposure(QThread):
         # invalid for now
         beamConfigDate = 9998.0
 
-        self.actor.insert('sps_exposure',
-                          pfs_visit_id=int(visit), sps_camera_id=int(cam.camId), exptime=float(self.exptime),
-                          time_exp_start=time_exp_start, time_exp_end=time_exp_end,
-                          beam_config_date=float(beamConfigDate))
-        return cam.camName
+        row = dict(pfs_visit_id=int(visit), sps_camera_id=int(cam.camId), exptime=float(self.exptime),
+                   time_exp_start=time_exp_start, time_exp_end=time_exp_end,
+                   beam_config_date=float(beamConfigDate))
+        return cam.camName, row
 
     def handleTimeout(self):
         """Just a prototype."""
         pass
 
     def exit(self):
-        """Overriding QThread.exit(self)."""
+        """Overriding PooledThread.exit(self)."""
+        for timingCheck in self.timingChecks:
+            timingCheck.cancel()
+
         self.hxRead.removeCallback(self.hxReadCB)
         self.filename.removeCallback(self.newFileNameCB)
-        QThread.exit(self)
+        PooledThread.exit(self)
+
+
+class HxRampSplit(HxExposure):
+    """Single long H4 ramp, split into consecutive dark visits at read boundaries.
+
+    The ramp is started with the first visit, each visit then covers the next nRead(exptime) reads, so that reset and
+    first read are only paid once for the whole set. Per-visit rows are built from the hxread stream.
+    """
+
+    def __init__(self, exp, cam):
+        # the ramp goes on from one visit to the next, those need to be there before the first reset.
+        self.rampVisit = exp.visits[0]
+        self.rampStarted = False
+        self.splits = []
+
+        HxExposure.__init__(self, exp, cam)
+
+        self.nReadPerVisit = max(round(exp.exptime / self.readTime), 1)
+        # a single reference read, then consecutive visits.
+        self.nRead = self.nRead0 = self.nReadPerVisit * len(exp.visits) + 1
+
+    @property
+    def splitIndex(self):
+        return self.exp.visits.index(self.exp.visit)
+
+    @property
+    def isLastVisit(self):
+        return self.exp.visit == self.exp.visits[-1]
+
+    @property
+    def storable(self):
+        if self.discarded:
+            return False
+
+        # last visit is only done when the ramp file is written.
+        if self.isLastVisit:
+            return self.readVar is not None and len(self.splits) == len(self.exp.visits)
+
+        return len(self.splits) > self.splitIndex
+
+    @property
+    def isFinished(self):
+        return self.storable or self.cleared or self.rampVar is not None
+
+    def reset(self):
+        """Nothing to reset once the ramp is started."""
+        if not self.rampStarted:
+            HxExposure.reset(self)
+
+    def expose(self, cmd, visit):
+        """Start the ramp with the first visit only."""
+        if self.rampStarted:
+            return
+
+        self.rampStarted = True
+        HxExposure.expose(self, cmd, visit)
+
+    def hxReadCB(self, keyVar):
+        """H4 read callback, declare a new split whenever a visit worth of reads is done."""
+        visit, nRamp, nGroup, nRead = keyVar.getValue(doRaise=False)
+
+        # no need to go further.
+        if visit != self.rampVisit:
+            return
+
+        self.actor.bcast.debug(f'text="{self.hx} {visit} {nRamp} {nGroup} {nRead}"')
+
+        if nGroup == 0:
+            self.states.append('reset')
+
+        elif nGroup == 1 and nRead == 1:
+            self.wipedAt = pfsTime.timestamp()
+            self.states.append('integrating')
+
+        elif nGroup == 1 and not (nRead - 1) % self.nReadPerVisit and len(self.splits) < len(self.exp.visits):
+            self.declareSplit(nRead)
+
+        self.stateChanged.notify()
+
+    def declareSplit(self, nRead):
+        """Declare the end of the next visit."""
+        startAt = self.splits[-1][-1] if self.splits else self.wipedAt
+        self.splits.append((self.exp.visits[len(self.splits)], nRead - self.nReadPerVisit, nRead,
+                            startAt, pfsTime.timestamp()))
+        self.exp.camStateChanged(self)
+
+    def newFileNameCB(self, keyVar):
+        """H4 callback when the ramp filename gets generated, publish visits boundaries."""
+        filepath = keyVar.getValue(doRaise=False)
+
+        # no need to go further
+        if filepath is None:
+            return
+
+        visit, __, __ = getExposureInfo(filepath)
+
+        # no need to go further.
+        if visit != self.rampVisit:
+            return
+
+        for visit, read0, read1, __, __ in self.splits:
+            self.exp.cmd.inform(f'hxRampSplit={visit},{self.cam},{qstr(filepath)},{read0},{read1}')
+
+        self.readVar = keyVar
+        self.exp.camStateChanged(self)
+
+    def exposureRow(self):
+        """Return camera name and sps_exposure row for the current visit."""
+        visit, read0, read1, startAt, endAt = self.splits[self.splitIndex]
+        cam = idsUtils.camFromNums(specNum=self.cam.specNum, armNum=self.cam.armNum)
+
+        time_exp_start = pfsTime.Time.fromtimestamp(startAt).to_datetime()
+        time_exp_end = pfsTime.Time.fromtimestamp(endAt).to_datetime()
+        # invalid for now
+        beamConfigDate = 9998.0
+
+        row = dict(pfs_visit_id=int(visit), sps_camera_id=int(cam.camId),
+                   exptime=float(round(self.nReadPerVisit * self.readTime, 3)),
+                   time_exp_start=time_exp_start, time_exp_end=time_exp_end,
+                   beam_config_date=float(beamConfigDate))
+        return cam.camName, row
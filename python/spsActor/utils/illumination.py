@@ -0,0 +1,83 @@
+import ics.utils.time as pfsTime
+from ics.utils.sps.lamps.utils.lampState import allLamps
+from twisted.internet import reactor
+
+
+class IlluminationStatus(object):
+    """Generate fiberIllumination as soon as the keywords it relies on are received, once the shutters are closed.
+
+    Every module shutterTimings needs to match the visit, and the keywords of every lamp commanded during the visit
+    need to be updated after the lamps command was sent, otherwise the keyword is generated anyway when the timeout
+    expires. Everything happens in the reactor thread.
+    """
+    timeout = 3
+
+    def __init__(self, exp):
+        self.exp = exp
+        # modules are cleared when the exposure exits, which might happen before the timeout.
+        self.specModules = list(exp.smThreads)
+        self.lampsThreads = [thread for thread in exp.lampsThreads if thread.goSentAt is not None]
+        self.closedAt = pfsTime.timestamp()
+
+        self.keyVars = []
+        self.lampKeyVars = []
+        self.timeoutCall = None
+        self.done = False
+
+    def start(self):
+        """Start listening to shutterTimings and lamps keywords."""
+        for specModule in self.specModules:
+            self.listen(specModule.enuKeyVarDict['shutterTimings'])
+
+        # lamps which were not commanded during this visit are not expected to change.
+        for thread in self.lampsThreads:
+            keyVarDict = self.exp.actor.models[thread.lampsActor].keyVarDict
+
+            for lamp in allLamps:
+                try:
+                    self.lampKeyVars.append((self.listen(keyVarDict[lamp]), thread.goSentAt))
+                except KeyError:
+                    continue
+
+        self.timeoutCall = reactor.callLater(IlluminationStatus.timeout, self.generate, True)
+        # keywords might have been received already.
+        self.keyVarCB(None)
+
+    def listen(self, keyVar):
+        """Add keyVar callback."""
+        keyVar.addCallback(self.keyVarCB, callNow=False)
+        self.keyVars.append(keyVar)
+        return keyVar
+
+    def keyVarCB(self, keyVar):
+        """Generate fiberIllumination as soon as everything is received."""
+        if self.done:
+            return
+
+        if all([specModule.shutterTimingsReceived() for specModule in self.specModules]) and self.lampsReceived():
+            self.generate()
+
+    def lampsReceived(self):
+        """Return True if every lamp keyword was updated after its lamps command was sent."""
+        return all([keyVar.timestamp >= goSentAt for keyVar, goSentAt in self.lampKeyVars])
+
+    def generate(self, timedOut=False):
+        """Generate fiberIllumination and the time it took to get there."""
+        if self.done:
+            return
+
+        self.done = True
+
+        if not timedOut and self.timeoutCall.active():
+            self.timeoutCall.cancel()
+
+        for keyVar in self.keyVars:
+            keyVar.removeCallback(self.keyVarCB)
+
+        self.keyVars.clear()
+
+        if timedOut:
+            self.exp.cmd.warn(f'text="fiberIllumination keywords not received after {IlluminationStatus.timeout}s"')
+
+        self.exp.genIlluminationStatus(self.specModules)
+        self.exp.cmd.inform(f'fiberIlluminationWait={self.exp.visit},{pfsTime.timestamp() - self.closedAt:.3f}')
@@ -0,0 +1,220 @@
+import subprocess
+import sys
+import threading
+from multiprocessing import Pipe
+
+import ics.utils.time as pfsTime
+from spsActor.utils import deferredExposure
+from twisted.internet import reactor
+
+# Isolated exposure engine.
+#
+# Deferred engine where the exposure control of each spectrograph module runs in its own long-lived worker process,
+# see moduleControl. Hub traffic, keywords and opdb stay in the actor, the worker only requests the next step and the
+# module exposure drives it from the reactor thread, a stuck module can only stall its own process.
+
+
+class ModuleProcess(object):
+    """Worker process running the exposure control of one spectrograph module, reused across visits."""
+
+    def __init__(self, actor, specNum):
+        self.actor = actor
+        self.specNum = specNum
+        self.handlers = dict()
+        self.sendLock = threading.Lock()
+
+        self.conn, childConn = Pipe()
+        fd = childConn.fileno()
+        # plain interpreter, the actor main module is not imported again in the worker.
+        self.process = subprocess.Popen([sys.executable, '-m', 'spsActor.utils.moduleControl', str(fd)],
+                                        pass_fds=(fd,))
+        childConn.close()
+
+        reactor.addReader(self)
+
+    @property
+    def isAlive(self):
+        return self.process.poll() is None
+
+    def logPrefix(self):
+        return f'sm{self.specNum}Control'
+
+    def fileno(self):
+        return self.conn.fileno()
+
+    def attach(self, visit, handler):
+        """Route the requests of that visit to handler."""
+        self.handlers[visit] = handler
+
+    def detach(self, visit):
+        """Stop routing the requests of that visit, the worker gives up on it."""
+        if self.handlers.pop(visit, None) is not None:
+            self.send('release', visit)
+
+    def send(self, name, visit, *args):
+        """Send a message to the worker, messages are sent from the reactor and the command threads."""
+        try:
+            with self.sendLock:
+                self.conn.send((name, visit) + args)
+        except OSError as e:
+            self.actor.logger.warning(f'{self.logPrefix()} could not send {name}: {e}')
+
+    def doRead(self):
+        """Called by the reactor, dispatch worker requests to their visit handler."""
+        try:
+            while self.conn.poll():
+                step, visit, *args = self.conn.recv()
+                handler = self.handlers.get(visit)
+
+                if handler is not None:
+                    handler(step, *args)
+
+        except (EOFError, OSError):
+            reactor.removeReader(self)
+            self.died()
+
+    def connectionLost(self, reason):
+        """Called by the reactor on shutdown."""
+        self.conn.close()
+
+    def died(self):
+        """Worker process is gone, every ongoing visit is aborted."""
+        handlers, self.handlers = self.handlers, dict()
+
+        for handler in handlers.values():
+            handler('abort', f'{self.logPrefix()} process died')
+
+    def exit(self):
+        """Stop the worker process."""
+        reactor.removeReader(self)
+        self.send('exit', None)
+        self.conn.close()
+
+
+class ModuleProcessPool(object):
+    """Worker processes owned by the actor, one per spectrograph module, started on first use."""
+
+    def __init__(self, actor):
+        self.actor = actor
+        self.processes = dict()
+
+    def acquire(self, specNum):
+        """Return the worker process of that module, (re)starting it if needed, must be called from the reactor."""
+        process = self.processes.get(specNum)
+
+        if process is None or not process.isAlive:
+            process = ModuleProcess(self.actor, specNum)
+            self.processes[specNum] = process
+
+        return process
+
+    def exit(self):
+        """Stop all worker processes."""
+        for process in self.processes.values():
+            process.exit()
+
+        self.processes.clear()
+
+
+class SpecModuleExposure(deferredExposure.SpecModuleExposure):
+    """Spectrograph module exposure, steps are requested by the module worker process."""
+
+    def __init__(self, *args, **kwargs):
+        deferredExposure.SpecModuleExposure.__init__(self, *args, **kwargs)
+        self.control = None
+        self.exposeStart = None
+
+    @property
+    def visit(self):
+        return self.exp.visit
+
+    def expose(self, cmd, visit):
+        """Hand the exposure control over to the module worker process."""
+        self.cmd = cmd
+        self.control = self.actor.moduleProcesses.acquire(self.specNum)
+        self.control.attach(visit, self.handleRequest)
+        self.control.send('expose', visit)
+
+    def reply(self, step, *args):
+        """Reply to the worker process."""
+        self.control.send(step, self.visit, *args)
+
+    def handleRequest(self, step, *args):
+        """Drive the step requested by the worker process."""
+        if step == 'wipe':
+            self.doWipe()
+        elif step == 'integrate':
+            self.doIntegrate()
+        elif step == 'read':
+            exptime, dateobs = args
+            self.read(self.cmd, visit=self.visit, exptime=exptime, dateobs=dateobs)
+        elif step == 'clear':
+            self.doClear()
+        elif step == 'finishShutters':
+            self.finishShutters(self.cmd)
+        elif step == 'abort':
+            reason, = args
+            self.exp.abort(self.cmd, reason=reason)
+        elif step == 'failure':
+            reason, = args
+            self.exp.failures.add(reason=reason)
+        elif step == 'done':
+            self.control.handlers.pop(self.visit, None)
+
+    def doWipe(self):
+        """Wipe step, reply whether it succeeded."""
+        deferred = self.wipe(self.cmd)
+        deferred.addCallbacks(lambda __: self.reply('wipe', True, ''),
+                              lambda failure: self.reply('wipe', False, str(failure.value)))
+
+    def doIntegrate(self):
+        """Integrate step, reply with exptime and dateobs, estimated from the shutters state on failure."""
+        self.listenToShutters()
+        self.postWipeFunc()
+        self.exposeStart = pfsTime.Time.now()
+
+        def integrated(result):
+            exptime, dateobs = result
+            self.reply('integrate', True, exptime, dateobs, self.shutterState.wasOpen, '')
+
+        def failed(failure):
+            if self.shutterState.wasOpen:
+                self.actor.logger.warning(f'{self.specName} shutters failed after opening, still reading data...')
+            else:
+                self.actor.logger.warning(f'{self.specName} shutters failed before opening, discarding data...')
+
+            exptime = pfsTime.Time.now().timestamp() - self.exposeStart.timestamp()
+            self.reply('integrate', False, exptime, self.exposeStart.isoformat(), self.shutterState.wasOpen,
+                       str(failure.value))
+
+        self.integrate(self.cmd).addCallbacks(integrated, failed)
+
+    def doClear(self):
+        """Clear step, reply once every camera is cleared."""
+        self.clearing = self.clearExposure(self.cmd)
+        self.clearing.addBoth(lambda __: self.reply('cleared'))
+
+    def finishShutters(self, cmd):
+        """Command shutters to finish the exposure without blocking."""
+        deferred = self.actor.deferredCall(cmd, actor=self.enuName, cmdStr='exposure finish')
+        deferred.addCallback(lambda cmdVar: self.actor.warnOnFailure(cmd, self.enuName, 'exposure finish', cmdVar))
+
+    def finish(self, cmd, doDiscard=False):
+        """Forward finish to the worker process, which decides between clearing and finishing shutters."""
+        # worker not started yet or already done with that visit, nothing to decide on.
+        if self.control is None or self.visit not in self.control.handlers:
+            return deferredExposure.SpecModuleExposure.finish(self, cmd, doDiscard=doDiscard)
+
+        self.control.send('finish', self.visit, doDiscard, self.shutterState.isOpen, self.shutterState.wasOpen)
+
+    def exit(self):
+        """Free up all resources, worker process gives up on that visit if it did not complete."""
+        if self.control is not None:
+            self.control.detach(self.visit)
+
+        deferredExposure.SpecModuleExposure.exit(self)
+
+
+class Exposure(deferredExposure.Exposure):
+    """Deferred exposure, with module exposure control isolated in worker processes."""
+    SpecModuleExposureClass = SpecModuleExposure
@@ -3,12 +3,12 @@ import time
 import ics.utils.cmd as cmdUtils
 import ics.utils.time as pfsTime
 import spsActor.utils.exception as exception
-from actorcore.QThread import QThread
 from ics.utils.sps.lamps.utils.lampState import allLamps
 from ics.utils.threading import threaded
+from spsActor.utils.workers import PooledThread
 
 
-class LampsControl(QThread):
+class LampsControl(PooledThread):
     """ Placeholder to handle lamp cmd threading. """
     goCmd = 'go'
     abortCmd = 'stop'
@@ -21,15 +21,25 @@ class LampsControl(QThread):
         self.exp = exp
         self.lampsActor = lampsActor
         self.cmdVar = None
-        self.goSignal = False
+        self._goSignal = False
         self.aborted = None
-        QThread.__init__(self, exp.actor, threadName)
-        QThread.start(self)
+        # lamps keywords generated before that time do not belong to this visit.
+        self.goSentAt = None
+        PooledThread.__init__(self, exp.actor, threadName)
 
     @property
     def isReady(self):
         return self.cmdVar is not None
 
+    @property
+    def goSignal(self):
+        return self._goSignal
+
+    @goSignal.setter
+    def goSignal(self, goSignal):
+        self._goSignal = goSignal
+        self.exp.stateChanged.notify()
+
     @staticmethod
     def lampState(keyVar, shutterOpenTime, shutterCloseTime):
         # retrieve keyword value.
@@ -78,6 +88,7 @@ class LampsControl(QThread):
 
     def _go(self, cmd):
         """ Send go command to lampActor. """
+        self.goSentAt = pfsTime.timestamp()
         cmdVar = self.actor.crudeCall(cmd, actor=self.lampsActor, cmdStr=self.goCmd,
                                       timeLim=self.exp.exptime + LampsControl.goTimeMargin)
 
@@ -91,6 +102,7 @@ class LampsControl(QThread):
         """ Full lamp control routine.  """
         try:
             self.cmdVar = self._waitForReadySignal(cmd)
+            self.exp.stateChanged.notify()
             # Wait for the go signal, namely when all shutters are opened.
             self.waitForGoSignal()
             # Ask lamp controller to pulse lamps with the configured timing.
@@ -104,14 +116,7 @@ class LampsControl(QThread):
 
     def waitForGoSignal(self):
         """ Wait for go signal from the shutters.  """
-        while not self.goSignal:
-            if self.exp.doFinish:
-                raise exception.EarlyFinish
-
-            if self.exp.doAbort:
-                raise exception.ExposureAborted
-
-            pfsTime.sleep.millisec()
+        self.exp.token.waitFor(lambda: self.goSignal)
 
     def abort(self, cmd):
         """ Send stop command. """
@@ -147,6 +152,7 @@ class ShutterControlled(LampsControl):
             self.waitForGoSignal()
             # When _go() returns, here without blocking, it declares self.isReady=True, thus the shutters can be opened.
             self.cmdVar = self._go(cmd)
+            self.exp.stateChanged.notify()
 
         except Exception as e:
             self.abort(cmd)
@@ -154,6 +160,7 @@ class ShutterControlled(LampsControl):
 
     def _go(self, cmd):
         """ Send go command, no blocking.  """
+        self.goSentAt = pfsTime.timestamp()
         cmdVar = self.actor.crudeCall(cmd, actor=self.lampsActor, cmdStr='go noWait',
                                       timeLim=LampsControl.goNoWaitTimeLim)
 
@@ -166,14 +173,14 @@ class ShutterControlled(LampsControl):
         return cmdVar
 
 
-class NoLamps(QThread):
+class NoLamps(PooledThread):
     def __init__(self, exp, threadName='noLampsControl'):
         self.exp = exp
         self.isReady = True
         self.lampsActor = 'noLamps'
+        self.goSentAt = None
 
-        QThread.__init__(self, exp.actor, threadName)
-        QThread.start(self)
+        PooledThread.__init__(self, exp.actor, threadName)
 
     @threaded
     def start(self, cmd):
@@ -1,5 +1,3 @@
-import ics.utils.time as pfsTime
-import spsActor.utils.exception as exception
 from spsActor.utils import exposure, lampsControl
 
 
@@ -76,14 +74,7 @@ class Exposure(exposure.Exposure):
 
     def waitForReadySignal(self):
         """ Wait ready signal from lampActor. """
-        while not self.lampsThread.isReady:
-            if self.doFinish:
-                raise exception.EarlyFinish
-
-            if self.doAbort:
-                raise exception.ExposureAborted
-
-            pfsTime.sleep.millisec()
+        self.token.waitFor(lambda: self.lampsThread.isReady)
 
         self.actor.bcast.debug(f'text="{self.lampsThread.lampsActor} is ready !!!"')
 
@@ -0,0 +1,141 @@
+import argparse
+import time
+from multiprocessing.connection import Connection
+
+# Spectrograph module exposure control, running in a worker process.
+#
+# The worker only makes the control decisions (which step comes next, what to do on failure, abort or finish), the
+# coordinator in the actor process drives the hardware and keywords, see isolatedExposure.
+# Messages are compact tuples (name, visit, *args), messages which do not belong to the current visit are ignored.
+#
+# worker -> coordinator : wipe, integrate, read(exptime, dateobs), clear, finishShutters, abort(reason),
+#                         failure(reason), done
+# coordinator -> worker : expose, wipe(ok, reason), integrate(ok, exptime, dateobs, wasOpen, reason), cleared,
+#                         finish(doDiscard, isOpen, wasOpen), release, exit
+
+
+class Released(Exception):
+    """Raised when the coordinator is not interested in that visit anymore."""
+
+
+class ModuleControl(object):
+    """Exposure control of a single spectrograph module for a given visit."""
+    shuttersFailedDelay = 1
+
+    def __init__(self, conn, visit):
+        self.conn = conn
+        self.visit = visit
+
+        self.replies = dict()
+        self.doAbort = False
+        self.doFinish = False
+        self.clearing = False
+        self.cleared = False
+
+    def request(self, step, *args):
+        """Request a step from the coordinator."""
+        self.conn.send((step, self.visit) + args)
+
+    def step(self, step):
+        """Request a step and handle coordinator messages until it replies."""
+        self.request(step)
+
+        while step not in self.replies:
+            self.handle(self.conn.recv())
+
+        return self.replies.pop(step)
+
+    def handle(self, msg):
+        """Handle a message from the coordinator."""
+        name, visit, *args = msg
+
+        if visit != self.visit:
+            return
+
+        if name == 'release':
+            raise Released()
+        elif name == 'finish':
+            self.finish(*args)
+        elif name == 'cleared':
+            self.cleared = True
+        else:
+            self.replies[name] = args
+
+    def finish(self, doDiscard, isOpen, wasOpen):
+        """Finish or abort request, same logic as SpecModuleExposure.finish."""
+        self.doFinish = True
+        self.doAbort = self.doAbort or doDiscard
+
+        # If shutters were not open or doDiscard is forced, discard detectors.
+        if (not wasOpen or doDiscard) and not self.clearing:
+            self.clearing = True
+            self.request('clear')
+
+        if isOpen:
+            self.request('finishShutters')
+
+    def run(self):
+        """Full exposure routine, same logic as SpecModuleExposure.expose."""
+        try:
+            self.expose()
+        except Released:
+            return
+
+        self.request('done')
+
+    def expose(self):
+        """Wipe, integrate and read, requesting each step from the coordinator."""
+        ok, reason = self.step('wipe')
+
+        # wipe failed, or exposure was finished before shutters could open.
+        if not ok:
+            self.request('abort', reason)
+            return
+
+        ok, exptime, dateobs, wasOpen, reason = self.step('integrate')
+
+        if not ok:
+            if not wasOpen:
+                time.sleep(ModuleControl.shuttersFailedDelay)
+                self.request('abort', reason)
+                return
+
+            # shutters failed after opening, still reading data.
+            self.request('failure', reason)
+
+        # exposure was discarded, detectors might still be clearing while shutters are already closed.
+        if self.doAbort:
+            return
+
+        # never read detectors which are still being cleared.
+        while self.clearing and not self.cleared:
+            self.handle(self.conn.recv())
+
+        self.request('read', exptime, dateobs)
+
+
+def serve(conn):
+    """Worker process main loop, visits are controlled one after the other."""
+    while True:
+        try:
+            name, visit, *args = conn.recv()
+        except EOFError:
+            return
+
+        if name == 'exit':
+            return
+
+        if name == 'expose':
+            ModuleControl(conn, visit).run()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('fd', type=int, help='file descriptor of the connection to the coordinator')
+    args = parser.parse_args()
+
+    serve(Connection(args.fd))
+
+
+if __name__ == '__main__':
+    main()
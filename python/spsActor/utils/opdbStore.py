@@ -0,0 +1,27 @@
+from ics.utils.threading import threaded
+from spsActor.utils.workers import PooledThread
+
+
+class OpdbStore(PooledThread):
+    """Insert opdb rows from a single thread, so that database latency overlaps the exposures.
+
+    Rows are inserted in the order they were submitted, sps_visit rows always go before their sps_exposure rows.
+    """
+
+    def __init__(self, actor):
+        PooledThread.__init__(self, actor, 'opdbStore')
+
+    @threaded
+    def insert(self, cmd, table, callback=None, **kwargs):
+        """Insert row in opdb table, callback is called with the outcome whatever happens."""
+        success = False
+
+        try:
+            success = self.actor.insert(table, cmd=cmd, **kwargs)
+        finally:
+            if callback is not None:
+                callback(success)
+
+    def handleTimeout(self):
+        """ Just a prototype. """
+        pass
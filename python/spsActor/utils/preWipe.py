@@ -0,0 +1,140 @@
+import threading
+
+import ics.utils.time as pfsTime
+from ics.utils.threading import singleShot
+from spsActor.Commands.cmdList import CcdErase
+
+
+class PreWipe(object):
+    """Keep idle CCDs freshly erased in the background, while no exposure holds them.
+
+    Erase age is tracked for each camera, so that an incoming exposure can use a short-path wipe flavour on a
+    freshly erased camera, if one is configured. Erasing is disabled by default.
+    """
+    period = 120
+    freshness = 60
+
+    def __init__(self, actor):
+        self.actor = actor
+        self.erasedAt = dict()
+        self.erasing = set()
+        self.condition = threading.Condition()
+        self.nextTick = None
+
+    @property
+    def config(self):
+        return self.actor.actorConfig.get('preWipe', dict())
+
+    @property
+    def enabled(self):
+        return self.config.get('enabled', False)
+
+    @property
+    def erasePeriod(self):
+        return self.config.get('period', PreWipe.period)
+
+    @property
+    def maxAge(self):
+        return self.config.get('freshness', PreWipe.freshness)
+
+    @property
+    def shortWipeFlavour(self):
+        return self.config.get('shortWipe', '')
+
+    def start(self):
+        """Start erasing idle cameras periodically, if enabled."""
+        self.stop()
+
+        if self.enabled:
+            self.nextTick = self.actor.scheduler.callLater(self.erasePeriod, self.tick)
+
+    def stop(self):
+        """Stop erasing idle cameras, ongoing erase is not interrupted."""
+        if self.nextTick is not None:
+            self.nextTick.cancel()
+            self.nextTick = None
+
+    def tick(self):
+        """Called by the actor scheduler, erase the idle cameras and schedule the next tick."""
+        try:
+            cams = self.reserveIdleCams()
+
+            if cams:
+                self.erase(self.actor.bcast, cams)
+        finally:
+            self.nextTick = self.actor.scheduler.callLater(self.erasePeriod, self.tick)
+
+    def isIdle(self, cam):
+        """Return True if no exposure holds or waits for that camera and the ccd is idle."""
+        if not (self.actor.cameraHandover.isFree(cam) and self.actor.resources.isFree({str(cam)})):
+            return False
+
+        try:
+            state = self.actor.models[cam.actorName].keyVarDict['exposureState'].getValue(doRaise=False)
+        except KeyError:
+            return False
+
+        return state == 'idle'
+
+    def reserveIdleCams(self):
+        """Mark idle cameras which were not erased recently as being erased, and return them."""
+        if self.actor.spsConfig is None:
+            return []
+
+        now = pfsTime.timestamp()
+        ccds = [cam for cam in self.actor.spsConfig.identify(filter='operational') if cam.arm != 'n']
+
+        with self.condition:
+            cams = [cam for cam in ccds if str(cam) not in self.erasing and self.isIdle(cam)
+                    and now - self.erasedAt.get(str(cam), 0) >= self.erasePeriod]
+            self.erasing |= set(map(str, cams))
+
+        return cams
+
+    @singleShot
+    def erase(self, cmd, cams):
+        """Erase cameras through the usual CcdErase path, and keep track of when it succeeded."""
+        syncCmd = CcdErase(self.actor, cams=cams)
+
+        try:
+            syncCmd.call(cmd)
+            syncCmd.sync(timeout=CcdErase.timeLim + 5)
+
+            with self.condition:
+                for th in syncCmd.cmdThd:
+                    if th.cmdVar is not None and not th.cmdVar.didFail:
+                        self.erasedAt[th.name] = pfsTime.timestamp()
+                    else:
+                        self.erasedAt.pop(th.name, None)
+
+        finally:
+            syncCmd.clear()
+
+            with self.condition:
+                self.erasing -= set(map(str, cams))
+                self.condition.notify_all()
+
+    def claim(self, cam):
+        """Called by exposures before wiping, wait for any ongoing erase to complete.
+
+        Erase freshness is consumed, return True if that camera was erased recently.
+        """
+        with self.condition:
+            self.condition.wait_for(lambda: str(cam) not in self.erasing, timeout=CcdErase.timeLim + 5)
+
+            if str(cam) in self.erasing:
+                return False
+
+            erasedAt = self.erasedAt.pop(str(cam), None)
+
+        return erasedAt is not None and pfsTime.timestamp() - erasedAt < self.maxAge
+
+    def genStatus(self, cmd):
+        """Generate preWipe keyword, enabled flag, period and freshness, and age of each erase."""
+        now = pfsTime.timestamp()
+        cmd.inform(f'preWipe={self.enabled},{self.erasePeriod},{self.maxAge}')
+
+        with self.condition:
+            ages = [f'{cam}({now - erasedAt:.1f})' for cam, erasedAt in sorted(self.erasedAt.items())]
+
+        cmd.inform(f'erasedCams={",".join(ages) if ages else "none"}')
@@ -0,0 +1,100 @@
+import threading
+
+
+def exposureResources(spsConfig, cams, exptype, doLamps=False, doIIS=False, doSlideSlit=False, **kwargs):
+    """Return the set of resources driven by an exposure: cameras, shutters, lamps and slits."""
+    resources = set(map(str, cams))
+    specNums = set([cam.specNum for cam in cams])
+
+    # darks and biases never open the shutters.
+    if exptype not in ['bias', 'dark']:
+        resources |= set([f'enu_sm{specNum}' for specNum in specNums])
+
+    if doLamps:
+        resources |= set([spsConfig[f'sm{specNum}'].lightSource.lampsActor for specNum in specNums])
+
+    if doIIS:
+        resources.add('iis')
+
+    if doSlideSlit:
+        resources |= set([f'slit_sm{specNum}' for specNum in specNums])
+
+    return resources
+
+
+class ResourceManager(object):
+    """Lease spectrograph resources to exposures, so that concurrent exposures never drive the same hardware.
+
+    Exposures on disjoint resources can run in parallel, conflicting requests are rejected (or queued by the caller).
+    Pipelined exposures can share their cameras and shutters, since they wait for the cameras to be handed over, but
+    only with owners which agreed to share them as well.
+    """
+
+    def __init__(self):
+        self.leases = dict()
+        self.shared = dict()
+        self.lock = threading.RLock()
+
+    def isShareable(self, resource, shareable):
+        """Return True if that resource can be shared, meaning that every current owner agreed to share it."""
+        return resource in shareable and set(self.leases[resource]) <= self.shared.get(resource, set())
+
+    def conflicts(self, resources, shareable=()):
+        """Return currently leased resources among those, along with their owners."""
+        with self.lock:
+            return [f'{resource}({",".join(map(str, self.leases[resource]))})'
+                    for resource in sorted(resources)
+                    if self.leases.get(resource) and not self.isShareable(resource, shareable)]
+
+    def owners(self, resource):
+        """Return current owners of that resource."""
+        with self.lock:
+            return list(self.leases.get(resource, []))
+
+    def leasedBy(self, owner):
+        """Return resources currently leased by that owner."""
+        with self.lock:
+            return set([resource for resource, owners in self.leases.items() if owner in owners])
+
+    def isFree(self, resources):
+        """Return True if none of those resources is leased."""
+        return not self.conflicts(resources)
+
+    def lease(self, owner, resources, shareable=()):
+        """Lease all resources at once, return the conflicting ones if any, in which case nothing is leased.
+
+        Shareable resources are only shared with owners which declared them shareable too.
+        """
+        with self.lock:
+            conflicts = self.conflicts(resources, shareable=shareable)
+
+            if conflicts:
+                return conflicts
+
+            for resource in resources:
+                self.leases.setdefault(resource, []).append(owner)
+
+                if resource in shareable:
+                    self.shared.setdefault(resource, set()).add(owner)
+
+        return []
+
+    def release(self, owner):
+        """Release all resources leased by that owner."""
+        with self.lock:
+            for resource, owners in list(self.leases.items()):
+                if owner in owners:
+                    owners.remove(owner)
+
+                self.shared.get(resource, set()).discard(owner)
+
+                if not owners:
+                    self.leases.pop(resource)
+                    self.shared.pop(resource, None)
+
+    def genStatus(self, cmd):
+        """Generate resources keyword, listing leased resources."""
+        with self.lock:
+            leased = [f'{resource}({",".join(map(str, owners))})' for resource, owners in sorted(self.leases.items())]
+
+        cmd.inform(f'resources={",".join(leased) if leased else "none"}')
@@ -0,0 +1,92 @@
+import heapq
+import itertools
+import threading
+
+import ics.utils.time as pfsTime
+
+
+class ScheduledCall(object):
+    """Handle returned by the scheduler, a call can be cancelled until it fires."""
+
+    def __init__(self, deadline, func, args, kwargs):
+        self.deadline = deadline
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.cancelled = False
+
+    def cancel(self):
+        """Cancel the call, it is simply skipped when its deadline is reached."""
+        self.cancelled = True
+
+
+class Scheduler(threading.Thread):
+    """Single timer thread shared by the actor, firing registered callbacks at their deadline.
+
+    Deadlines are timestamps, like the ones returned by pfsTime.timestamp().
+    Callbacks are executed in the scheduler thread, so they are expected to return quickly,
+    typically setting a flag and notifying whoever is waiting on it.
+    """
+
+    def __init__(self, actor):
+        threading.Thread.__init__(self, name='scheduler', daemon=True)
+        self.actor = actor
+
+        self.heap = []
+        self.counter = itertools.count()
+        self.condition = threading.Condition()
+        self.doExit = False
+
+    def callAt(self, deadline, func, *args, **kwargs):
+        """Call func(*args, **kwargs) at the given timestamp."""
+        call = ScheduledCall(deadline, func, args, kwargs)
+
+        with self.condition:
+            # counter makes sure calls with the same deadline are never compared.
+            heapq.heappush(self.heap, (deadline, next(self.counter), call))
+            # the new call might be the earliest one.
+            self.condition.notify()
+
+        return call
+
+    def callLater(self, delay, func, *args, **kwargs):
+        """Call func(*args, **kwargs) after delay seconds."""
+        return self.callAt(pfsTime.timestamp() + delay, func, *args, **kwargs)
+
+    def nextCall(self):
+        """Block until the earliest call is due, return None if the scheduler is exiting."""
+        with self.condition:
+            while not self.doExit:
+                if not self.heap:
+                    self.condition.wait()
+                    continue
+
+                deadline, __, call = self.heap[0]
+                timeLeft = deadline - pfsTime.timestamp()
+
+                if timeLeft <= 0:
+                    heapq.heappop(self.heap)
+                    return call
+
+                self.condition.wait(timeLeft)
+
+    def run(self):
+        while True:
+            call = self.nextCall()
+
+            if call is None:
+                return
+
+            if call.cancelled:
+                continue
+
+            try:
+                call.func(*call.args, **call.kwargs)
+            except Exception as e:
+                self.actor.logger.warning(f'scheduled call {call.func} failed : {e}')
+
+    def exit(self):
+        """Stop the scheduler, pending calls are dropped."""
+        with self.condition:
+            self.doExit = True
+            self.condition.notify()
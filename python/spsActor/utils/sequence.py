@@ -0,0 +1,75 @@
+from collections import deque
+
+import spsActor.utils.exception as exception
+
+
+class ExposureSequence(object):
+    """Run a sequence of exposures of the same configuration back-to-back.
+
+    In pipelined mode, each frame is started right away and waits for the previous visit to hand the cameras over,
+    so that cameras are wiped for the next visit while the others are still reading and the previous frame is stored.
+    """
+
+    def __init__(self, actor, visits, expClass, doPipeline, **kwargs):
+        self.actor = actor
+        self.visits = visits
+        self.expClass = expClass
+        self.doPipeline = doPipeline
+        self.expKwargs = kwargs
+
+        self.doStop = False
+        self.nDone = 0
+        self.failures = exception.Failures()
+
+    def stop(self):
+        """Do not start any new frame."""
+        self.doStop = True
+
+    def run(self, cmd, ongoing):
+        """Run all frames, ongoing exposures are registered in the ongoing dictionary."""
+        frames = deque()
+
+        try:
+            for visit in self.visits:
+                # only one frame in flight if exposures cannot be pipelined.
+                if frames and not self.doPipeline:
+                    self.endFrame(cmd, frames.popleft(), ongoing)
+
+                if self.doStop:
+                    break
+
+                exp = self.expClass(self.actor, visit, doPipeline=self.doPipeline, **self.expKwargs)
+                ongoing[visit] = exp
+                frames.append(exp)
+                exp.start(cmd, visit)
+
+                # previous frame is read and stored while this one is being wiped.
+                if len(frames) > 1:
+                    self.endFrame(cmd, frames.popleft(), ongoing)
+
+            while frames:
+                self.endFrame(cmd, frames.popleft(), ongoing)
+
+        finally:
+            for exp in frames:
+                exp.exit()
+                ongoing.pop(exp.visit, None)
+
+    def endFrame(self, cmd, exp, ongoing):
+        """Wait for frame completion and generate its fileIds, a failed frame stops the sequence."""
+        try:
+            fileIds = exp.collect(cmd, visit=exp.visit)
+            failures = exp.failures.format()
+
+            if failures:
+                cmd.warn(fileIds)
+                self.failures.add(failures)
+                self.stop()
+            else:
+                cmd.inform(fileIds)
+
+            self.nDone += 1
+
+        finally:
+            exp.exit()
+            ongoing.pop(exp.visit, None)
@@ -21,6 +21,7 @@ class ShutterState(object):
         """
         self.spec = spec
         self.states = ['none']
+        self.keyVar = None
 
     @property
     def isOpen(self):
@@ -77,6 +78,31 @@ class ShutterState(object):
 
         return isNew
 
+    def attach(self, keyVar):
+        """
+        Start listening to the shutters keyword, only once.
+
+        Parameters:
+        ----------
+        keyVar : object
+            The shutters keyword variable.
+        """
+        if self.keyVar is not None:
+            return
+
+        self.keyVar = keyVar
+        self.keyVar.addCallback(self.callback)
+
+    def detach(self):
+        """
+        Stop listening to the shutters keyword.
+        """
+        if self.keyVar is None:
+            return
+
+        self.keyVar.removeCallback(self.callback)
+        self.keyVar = None
+
     def callback(self, keyVar):
         """
         Callback to handle updates to the shutter state.
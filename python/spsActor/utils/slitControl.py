@@ -1,11 +1,10 @@
 import ics.utils.cmd as cmdUtils
-import ics.utils.time as pfsTime
 import spsActor.utils.exception as exception
-from actorcore.QThread import QThread
 from ics.utils.threading import threaded
+from spsActor.utils.workers import PooledThread
 
 
-class SlitControl(QThread):
+class SlitControl(PooledThread):
     """ Placeholder to handle slit cmd threading. """
     timeMargin = 30
     abortTimeLim = 15
@@ -18,10 +17,18 @@ class SlitControl(QThread):
 
         self.cmdVar = None
         self.aborted = None
-        self.goSignal = False
+        self._goSignal = False
 
-        QThread.__init__(self, exp.actor, 'slitControl')
-        QThread.start(self)
+        PooledThread.__init__(self, exp.actor, 'slitControl')
+
+    @property
+    def goSignal(self):
+        return self._goSignal
+
+    @goSignal.setter
+    def goSignal(self, goSignal):
+        self._goSignal = goSignal
+        self.exp.stateChanged.notify()
 
     def _go(self, cmd):
         """ Send linearVerticalMove command to enuActor. """
@@ -48,14 +55,7 @@ class SlitControl(QThread):
 
     def _waitForGoSignal(self):
         """ Wait for go signal from the shutters.  """
-        while not self.goSignal:
-            if self.exp.doFinish:
-                raise exception.EarlyFinish
-
-            if self.exp.doAbort:
-                raise exception.ExposureAborted
-
-            pfsTime.sleep.millisec()
+        self.exp.token.waitFor(lambda: self.goSignal)
 
     def abort(self, cmd):
         """ Send stop command. """
@@ -1,8 +1,8 @@
 import ics.utils.cmd as cmdUtils
-import ics.utils.time as pfsTime
 import spsActor.utils.exception as exception
-from actorcore.QThread import QThread
 from ics.utils.threading import threaded
+from spsActor.utils import events
+from spsActor.utils.workers import PooledThread
 
 
 class SpsCmd(object):
@@ -11,6 +11,7 @@ class SpsCmd(object):
     def __init__(self, spsActor):
         self.spsActor = spsActor
         self.cmdThd = None
+        self.latch = None
 
         self.didFail = False
         self.failures = exception.Failures()
@@ -22,12 +23,14 @@ class SpsCmd(object):
     def attachThreads(self, threads):
         """ Attach command threads. """
         self.cmdThd = threads
+        # each thread counts down once its command returned, successfully or not.
+        self.latch = events.CountdownLatch(len(threads))
 
-    def process(self, cmd):
-        """ Call, synchronise and handle results. """
+    def process(self, cmd, timeout=None):
+        """ Call, synchronise and handle results, timeout being an optional overall deadline in seconds. """
         self.inform(cmd)
         self.call(cmd)
-        didFail = self.sync()
+        didFail = self.sync(timeout=timeout)
 
         if didFail:
             cmd.fail(f'text="{self.failures.format()}"')
@@ -41,10 +44,11 @@ class SpsCmd(object):
         for th in self.cmdThd:
             th.call(cmd)
 
-    def sync(self):
+    def sync(self, timeout=None):
         """ Wait for command thread to be finished. """
-        while not self.finished:
-            pfsTime.sleep.millisec()
+        if not self.latch.wait(timeout=timeout):
+            pending = [th.fullCmdStr for th in self.cmdThd if not th.finished]
+            self.fail(f'{",".join(pending)} did not finish within {timeout} seconds')
 
         return self.didFail
 
@@ -52,6 +56,10 @@ class SpsCmd(object):
         """ Prototype. """
         pass
 
+    def threadDone(self, thread):
+        """ Called from command threads, whenever their command returned. """
+        self.latch.countDown()
+
     def fail(self, reason):
         """ Called from command threads, something wrong happened that's the reason. """
         self.didFail = True
@@ -62,15 +70,15 @@ class SpsCmd(object):
         cmd.finish()
 
     def clear(self):
-        """ Kill all command threads before exiting. """
+        """ Hand command threads workers back to the pool before exiting. """
         for th in self.cmdThd:
             th.exit()
 
         self.cmdThd.clear()
 
 
-class CmdThread(QThread):
-    """ Placeholder to handle single cmd threading """
+class CmdThread(PooledThread):
+    """ Placeholder to handle single cmd threading, calls are executed by the worker of the target actor. """
 
     def __init__(self, spsCmd, **cmdCall):
         self.spsCmd = spsCmd
@@ -80,8 +88,7 @@ class CmdThread(QThread):
         self.cancelled = False
 
         sw, identifier = cmdCall['actor'].split('_')
-        QThread.__init__(self, spsCmd.spsActor, identifier)
-        QThread.start(self)
+        PooledThread.__init__(self, spsCmd.spsActor, identifier, workerName=cmdCall['actor'])
 
     @property
     def finished(self):
@@ -113,6 +120,9 @@ class CmdThread(QThread):
             self.cancelled = True
             self.spsCmd.fail(reason=str(e))
 
+        finally:
+            self.spsCmd.threadDone(self)
+
     def precheck(self, cmd):
         """ To be called before the actual command. """
         cmd.inform(f'text="calling {self.fullCmdStr} timeLim({self.cmdCall["timeLim"]})"')
@@ -0,0 +1,30 @@
+import threading
+
+
+class TimingModel(object):
+    """Exponentially weighted moving average of durations measured along the exposures, indexed by name.
+
+    No prediction is made until enough samples were collected, so callers fall back on their regular behaviour.
+    """
+    alpha = 0.3
+    minSamples = 3
+
+    def __init__(self):
+        self.averages = dict()
+        self.nSamples = dict()
+        self.lock = threading.Lock()
+
+    def update(self, name, duration):
+        """Add a new duration sample."""
+        with self.lock:
+            average = self.averages.get(name, duration)
+            self.averages[name] = TimingModel.alpha * duration + (1 - TimingModel.alpha) * average
+            self.nSamples[name] = self.nSamples.get(name, 0) + 1
+
+    def predict(self, name):
+        """Return the expected duration, None if not enough samples were collected."""
+        with self.lock:
+            if self.nSamples.get(name, 0) < TimingModel.minSamples:
+                return None
+
+            return self.averages[name]
@@ -0,0 +1,84 @@
+import threading
+from collections import deque
+
+from ics.utils.threading import singleShot
+from pfscore.gen2 import fetchVisitFromGen2
+
+
+class VisitPool(object):
+    """Visit ids reserved from gen2 ahead of time, so that handing out a visit does not need any round-trip.
+
+    The pool is refilled in the background whenever it goes below the low-water mark, reserved visits that were
+    never used are reported when the pool is flushed.
+    """
+    size = 5
+    lowWater = 2
+
+    def __init__(self, actor):
+        self.actor = actor
+        self.visits = deque()
+        self.lock = threading.Lock()
+        self.refilling = False
+
+    @property
+    def config(self):
+        return self.actor.actorConfig.get('visitPool', dict())
+
+    @property
+    def poolSize(self):
+        return self.config.get('size', VisitPool.size)
+
+    @property
+    def lowWaterMark(self):
+        return self.config.get('lowWater', VisitPool.lowWater)
+
+    def get(self, cmd):
+        """Hand out the next reserved visit, only fetch it from gen2 if the pool is empty."""
+        with self.lock:
+            visit = self.visits.popleft() if self.visits else None
+
+        self.refill()
+
+        if visit is None:
+            visit = fetchVisitFromGen2(self.actor, cmd)
+
+        return visit
+
+    def refill(self):
+        """Start refilling the pool in the background if it went below the low-water mark."""
+        with self.lock:
+            if self.refilling or len(self.visits) >= min(self.lowWaterMark, self.poolSize):
+                return
+
+            self.refilling = True
+
+        self.fetchVisits(self.actor.bcast)
+
+    @singleShot
+    def fetchVisits(self, cmd):
+        """Reserve visits from gen2 until the pool is full."""
+        try:
+            while len(self.visits) < self.poolSize:
+                visit = fetchVisitFromGen2(self.actor, cmd)
+
+                with self.lock:
+                    self.visits.append(visit)
+
+        except Exception as e:
+            self.actor.logger.warning(f'failed to refill visit pool : {e}')
+
+        finally:
+            with self.lock:
+                self.refilling = False
+
+    def flush(self):
+        """Drop all reserved visits and return them, so they can be reported."""
+        with self.lock:
+            unused = list(self.visits)
+            self.visits.clear()
+
+        return unused
+
+    def genStatus(self, cmd):
+        """Generate visitPool keyword, number of reserved visits, pool size and low-water mark."""
+        cmd.inform(f'visitPool={len(self.visits)},{self.poolSize},{self.lowWaterMark}')
@@ -0,0 +1,111 @@
+import threading
+
+from actorcore.QThread import QThread
+
+
+class Worker(QThread):
+    """Long-lived thread, executing the threaded calls of whichever object it is leased to."""
+
+    def __init__(self, actor, name):
+        QThread.__init__(self, actor, name)
+        self.pending = 0
+        self.pendingLock = threading.Lock()
+        QThread.start(self)
+
+    @property
+    def isIdle(self):
+        return not self.pending
+
+    def submit(self, method, *argl, **argd):
+        """Queue a call, keeping track of the pending ones."""
+        with self.pendingLock:
+            self.pending += 1
+
+        self.putMsg(self.execute, method, *argl, **argd)
+
+    def execute(self, method, *argl, **argd):
+        """Execute a queued call."""
+        try:
+            method(*argl, **argd)
+        finally:
+            with self.pendingLock:
+                self.pending -= 1
+
+    def handleTimeout(self):
+        """ Just a prototype. """
+        pass
+
+
+class WorkerPool(object):
+    """Pool of long-lived workers owned by the actor, indexed by thread name (camera, module, control...)."""
+
+    def __init__(self, actor):
+        self.actor = actor
+        self.idle = dict()
+        self.lock = threading.Lock()
+
+    def acquire(self, name):
+        """Lease an idle worker for that name, only start a new thread if none is available."""
+        with self.lock:
+            # dead workers are dropped for good.
+            workers = [worker for worker in self.idle.get(name, []) if worker.is_alive()]
+            # a worker can be handed back while a call is still blocking, it stays in the pool until it is idle.
+            ready = [worker for worker in workers if worker.isIdle]
+            leased = ready[0] if ready else None
+
+            self.idle[name] = [worker for worker in workers if worker is not leased]
+
+        return Worker(self.actor, name) if leased is None else leased
+
+    def release(self, worker):
+        """Hand a worker back to the pool."""
+        with self.lock:
+            workers = self.idle.setdefault(worker.name, [])
+
+            if worker not in workers:
+                workers.append(worker)
+
+    def exit(self):
+        """Stop all idle workers."""
+        with self.lock:
+            for workers in self.idle.values():
+                for worker in workers:
+                    worker.exit()
+
+            self.idle.clear()
+
+
+class PooledThread(object):
+    """Drop-in replacement for QThread, threaded calls are executed by a worker leased from the actor pool.
+
+    The worker is leased on the first threaded call and kept for the lifetime of the object, then handed back
+    to the pool on exit, so that back-to-back exposures reuse the same threads instead of creating them over and
+    over again.
+    """
+
+    def __init__(self, actor, name, workerName=None):
+        self.actor = actor
+        self.name = name
+        # workers are indexed by thread name, unless specified otherwise.
+        self.workerName = name if workerName is None else workerName
+        self.worker = None
+        # threaded calls can be issued concurrently, a single worker needs to be leased.
+        self.workerLock = threading.Lock()
+
+    def putMsg(self, method, *argl, **argd):
+        """Called by the @threaded decorator, forward to the leased worker."""
+        with self.workerLock:
+            if self.worker is None:
+                self.worker = self.actor.workers.acquire(self.workerName)
+
+            worker = self.worker
+
+        worker.submit(method, *argl, **argd)
+
+    def exit(self):
+        """Hand the worker back to the pool."""
+        with self.workerLock:
+            worker, self.worker = self.worker, None
+
+        if worker is not None:
+            self.actor.workers.release(worker)
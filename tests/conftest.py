@@ -0,0 +1,5 @@
+import os
+import sys
+
+# spsActor is set up by eups from the python directory.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'python'))
@@ -0,0 +1,53 @@
+from spsActor.utils.camSets import CamExpSets
+
+
+class FakeCamExp(object):
+    def __init__(self):
+        self.cleared = False
+        self.isFinished = False
+        self.storable = False
+
+
+def test_new_camera_exposure_is_running():
+    camSets = CamExpSets()
+    camExp = FakeCamExp()
+    camSets.add(camExp)
+
+    assert camSets.running == {camExp}
+    assert not camSets.cleared and not camSets.finished and not camSets.storable
+    assert not camSets.isFinished
+
+
+def test_update_moves_camera_exposure_between_sets():
+    camSets = CamExpSets()
+    read, cleared = FakeCamExp(), FakeCamExp()
+    camSets.add(read)
+    camSets.add(cleared)
+
+    read.isFinished = read.storable = True
+    camSets.update(read)
+
+    assert camSets.finished == {read}
+    assert camSets.storable == {read}
+    assert not camSets.isFinished
+
+    cleared.cleared = cleared.isFinished = True
+    camSets.update(cleared)
+
+    assert camSets.running == {read}
+    assert camSets.cleared == {cleared}
+    assert camSets.storable == {read}
+    assert camSets.isFinished
+
+
+def test_snapshot_is_a_copy():
+    camSets = CamExpSets()
+    camExp = FakeCamExp()
+    camSets.add(camExp)
+
+    snapshot = camSets.snapshot(camSets.running)
+    camExp.cleared = True
+    camSets.update(camExp)
+
+    assert snapshot == [camExp]
+    assert not camSets.running
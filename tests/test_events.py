@@ -0,0 +1,48 @@
+import threading
+
+import pytest
+from spsActor.utils.events import CountdownLatch
+
+
+def test_latch_released_once_every_party_counted_down():
+    latch = CountdownLatch(2)
+    latch.countDown()
+    assert not latch.released
+    assert not latch.wait(timeout=0.05)
+
+    latch.countDown()
+    assert latch.released
+    assert latch.wait(timeout=0)
+
+
+def test_latch_wait_timeout():
+    latch = CountdownLatch(1)
+    assert not latch.wait(timeout=0.1)
+
+
+def test_latch_wakes_up_waiter():
+    latch = CountdownLatch(3)
+    threads = [threading.Timer(0.05, latch.countDown) for __ in range(3)]
+
+    for thread in threads:
+        thread.start()
+
+    assert latch.wait(timeout=5)
+
+
+def test_latch_count_down_on_failure():
+    latch = CountdownLatch(2)
+
+    def party(doFail):
+        try:
+            if doFail:
+                raise RuntimeError('failed')
+        finally:
+            latch.countDown()
+
+    party(False)
+
+    with pytest.raises(RuntimeError):
+        party(True)
+
+    assert latch.wait(timeout=0)
@@ -0,0 +1,138 @@
+from spsActor.utils.expQueue import ExposureQueue
+from spsActor.utils.resources import ResourceManager
+
+
+class FakeCmd(object):
+    def __init__(self):
+        self.keys = []
+
+    def inform(self, key):
+        self.keys.append(key)
+
+
+class FakeActor(object):
+    def __init__(self):
+        self.bcast = FakeCmd()
+        self.resources = ResourceManager()
+
+
+def makeQueue():
+    actor = FakeActor()
+    dispatched = []
+
+    def leaseFunc(entry):
+        return actor.resources.lease(entry.visit, entry.resources)
+
+    return ExposureQueue(actor, dispatched.append, leaseFunc), actor, dispatched
+
+
+def endExposure(queue, actor, visit):
+    actor.resources.release(visit)
+    queue.exposureEnded(visit)
+
+
+def test_dispatch_right_away_when_free():
+    queue, actor, dispatched = makeQueue()
+    entry = queue.put(1, {'b1', 'enu_sm1'}, exptype='arc')
+
+    assert dispatched == [entry]
+    assert entry.status == 'running'
+    assert 'queueEntry=1,1,arc,running' in actor.bcast.keys
+    assert actor.bcast.keys[-1] == 'exposureQueue=0,1'
+
+
+def test_dispatch_once_exposure_ended():
+    queue, actor, dispatched = makeQueue()
+    first = queue.put(1, {'b1', 'enu_sm1'}, exptype='arc')
+    second = queue.put(2, {'b1', 'enu_sm1'}, exptype='arc')
+
+    assert dispatched == [first]
+    assert second.status == 'queued'
+
+    first.status = 'done'
+    endExposure(queue, actor, 1)
+
+    assert dispatched == [first, second]
+    assert 1 not in queue
+    assert 'queueEntry=1,1,arc,done' in actor.bcast.keys
+
+
+def test_exposure_ended_while_running_is_failed():
+    queue, actor, dispatched = makeQueue()
+    queue.put(1, {'b1'}, exptype='flat')
+    endExposure(queue, actor, 1)
+
+    assert 1 not in queue
+    assert 'queueEntry=1,1,flat,failed' in actor.bcast.keys
+
+
+def test_exposure_ended_keeps_queued_entries():
+    queue, actor, dispatched = makeQueue()
+    queue.put(1, {'b1'}, exptype='flat')
+    queue.put(2, {'b1'}, exptype='flat')
+
+    queue.exposureEnded(2)
+    assert 2 in queue
+    assert [entry.visit for entry in queue.queued] == [2]
+
+
+def test_queued_entry_blocks_the_next_ones():
+    queue, actor, dispatched = makeQueue()
+    first = queue.put(1, {'b1'}, exptype='arc')
+    queue.put(2, {'b1', 'r1'}, exptype='arc')
+    third = queue.put(3, {'r1'}, exptype='arc')
+
+    assert dispatched == [first]
+    assert third.status == 'queued'
+
+
+def test_dispatch_leases_entry_resources():
+    queue, actor, dispatched = makeQueue()
+    queue.put(1, {'b1', 'enu_sm1'}, exptype='arc')
+
+    assert actor.resources.leasedBy(1) == {'b1', 'enu_sm1'}
+    # a direct exposure cannot take them anymore.
+    assert actor.resources.lease(2, {'b1'}) == ['b1(1)']
+
+
+def test_leased_resources_are_not_free():
+    queue, actor, dispatched = makeQueue()
+    actor.resources.lease(0, {'b1'})
+
+    entry = queue.put(1, {'b1'}, exptype='arc')
+    assert dispatched == []
+
+    actor.resources.release(0)
+    queue.dispatch()
+    assert dispatched == [entry]
+    assert actor.resources.leasedBy(1) == {'b1'}
+
+
+def test_direct_lease_before_dispatch_keeps_entry_queued():
+    queue, actor, dispatched = makeQueue()
+    first = queue.put(1, {'b1'}, exptype='arc')
+    second = queue.put(2, {'r1'}, exptype='arc')
+    assert dispatched == [first, second]
+
+    third = queue.put(3, {'b1'}, exptype='arc')
+    endExposure(queue, actor, 1)
+    assert dispatched == [first, second, third]
+
+    # resources taken by a direct exposure between put and dispatch.
+    fourth = queue.put(4, {'r1'}, exptype='arc')
+    actor.resources.release(2)
+    actor.resources.lease(5, {'r1'})
+    queue.exposureEnded(2)
+
+    assert fourth.status == 'queued'
+    assert 4 not in actor.resources.owners('r1')
+
+
+def test_remove_queued_entry():
+    queue, actor, dispatched = makeQueue()
+    queue.put(1, {'b1'}, exptype='arc')
+    queue.put(2, {'b1'}, exptype='arc')
+
+    assert queue.remove(1) is None
+    assert queue.remove(2).status == 'removed'
+    assert 2 not in queue
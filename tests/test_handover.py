@@ -0,0 +1,84 @@
+from spsActor.utils.handover import CameraHandover
+
+
+class FakeStateChanged(object):
+    def __init__(self):
+        self.nNotified = 0
+
+    def notify(self):
+        self.nNotified += 1
+
+
+class FakeCamExp(object):
+    def __init__(self, cam):
+        self.cam = cam
+        self.stateChanged = FakeStateChanged()
+
+
+def test_first_in_line_owns_the_camera():
+    handover = CameraHandover()
+    first, second = FakeCamExp('b1'), FakeCamExp('b1')
+    handover.request(first)
+    handover.request(second)
+
+    assert handover.isOwner(first)
+    assert not handover.isOwner(second)
+    assert not handover.isFree('b1')
+    assert handover.isFree('r1')
+
+
+def test_request_is_idempotent():
+    handover = CameraHandover()
+    first, second = FakeCamExp('b1'), FakeCamExp('b1')
+    handover.request(first)
+    handover.request(second)
+    handover.request(first)
+
+    handover.release(first)
+    assert handover.isOwner(second)
+
+    handover.release(second)
+    assert handover.isFree('b1')
+
+
+def test_release_wakes_up_next_owner():
+    handover = CameraHandover()
+    first, second = FakeCamExp('b1'), FakeCamExp('b1')
+    handover.request(first)
+    handover.request(second)
+
+    handover.release(first)
+    assert handover.isOwner(second)
+    assert second.stateChanged.nNotified == 1
+
+
+def test_release_while_waiting_keeps_owner():
+    handover = CameraHandover()
+    first, second, third = FakeCamExp('b1'), FakeCamExp('b1'), FakeCamExp('b1')
+    for camExp in [first, second, third]:
+        handover.request(camExp)
+
+    # aborted before getting the camera, nobody needs to be woken up.
+    handover.release(second)
+    assert handover.isOwner(first)
+    assert third.stateChanged.nNotified == 0
+
+    handover.release(first)
+    assert handover.isOwner(third)
+    assert third.stateChanged.nNotified == 1
+
+
+def test_release_unknown_camera_exposure():
+    handover = CameraHandover()
+    handover.release(FakeCamExp('b1'))
+
+    assert handover.isFree('b1')
+
+
+def test_cameras_are_independent():
+    handover = CameraHandover()
+    blue, red = FakeCamExp('b1'), FakeCamExp('r1')
+    handover.request(blue)
+    handover.request(red)
+
+    assert handover.isOwner(blue) and handover.isOwner(red)
@@ -0,0 +1,127 @@
+import threading
+from multiprocessing import Pipe
+
+import pytest
+from spsActor.utils import moduleControl
+
+
+class Coordinator(object):
+    """Drive a worker serving the other end of a pipe, from a thread."""
+
+    def __init__(self):
+        self.conn, childConn = Pipe()
+        self.worker = threading.Thread(target=moduleControl.serve, args=(childConn,), daemon=True)
+        self.worker.start()
+
+    def send(self, name, visit, *args):
+        self.conn.send((name, visit) + args)
+
+    def expect(self, step, visit=1):
+        assert self.conn.poll(5)
+        msg = self.conn.recv()
+        assert msg[:2] == (step, visit)
+        return msg[2:]
+
+    def exit(self):
+        self.send('exit', None)
+        self.worker.join(5)
+        assert not self.worker.is_alive()
+
+
+@pytest.fixture
+def coordinator():
+    coordinator = Coordinator()
+    yield coordinator
+    coordinator.exit()
+
+
+@pytest.fixture(autouse=True)
+def noDelay(monkeypatch):
+    monkeypatch.setattr(moduleControl.ModuleControl, 'shuttersFailedDelay', 0)
+
+
+def test_full_exposure(coordinator):
+    coordinator.send('expose', 1)
+    coordinator.expect('wipe')
+    coordinator.send('wipe', 1, True, '')
+    coordinator.expect('integrate')
+    coordinator.send('integrate', 1, True, 10.0, '2026-10-17T00:00:00', True, '')
+
+    assert coordinator.expect('read') == (10.0, '2026-10-17T00:00:00')
+    coordinator.expect('done')
+
+
+def test_wipe_failure_aborts(coordinator):
+    coordinator.send('expose', 1)
+    coordinator.expect('wipe')
+    coordinator.send('wipe', 1, False, 'WipeFailed()')
+
+    assert coordinator.expect('abort') == ('WipeFailed()',)
+    coordinator.expect('done')
+
+
+def test_shutters_failed_before_opening_aborts(coordinator):
+    coordinator.send('expose', 1)
+    coordinator.expect('wipe')
+    coordinator.send('wipe', 1, True, '')
+    coordinator.expect('integrate')
+    coordinator.send('integrate', 1, False, 0.1, '2026-10-17T00:00:00', False, 'ShuttersFailed()')
+
+    assert coordinator.expect('abort') == ('ShuttersFailed()',)
+    coordinator.expect('done')
+
+
+def test_shutters_failed_after_opening_still_reads(coordinator):
+    coordinator.send('expose', 1)
+    coordinator.expect('wipe')
+    coordinator.send('wipe', 1, True, '')
+    coordinator.expect('integrate')
+    coordinator.send('integrate', 1, False, 5.0, '2026-10-17T00:00:00', True, 'ShuttersFailed()')
+
+    assert coordinator.expect('failure') == ('ShuttersFailed()',)
+    assert coordinator.expect('read') == (5.0, '2026-10-17T00:00:00')
+    coordinator.expect('done')
+
+
+def test_discard_during_integration_skips_read(coordinator):
+    coordinator.send('expose', 1)
+    coordinator.expect('wipe')
+    coordinator.send('wipe', 1, True, '')
+    coordinator.expect('integrate')
+    coordinator.send('finish', 1, True, True, True)
+
+    coordinator.expect('clear')
+    coordinator.expect('finishShutters')
+    coordinator.send('integrate', 1, True, 3.0, '2026-10-17T00:00:00', True, '')
+    coordinator.expect('done')
+
+
+def test_read_waits_for_clear(coordinator):
+    coordinator.send('expose', 1)
+    coordinator.expect('wipe')
+    # finished before shutters opened, detectors are cleared but the exposure is not discarded.
+    coordinator.send('finish', 1, False, False, False)
+    coordinator.expect('clear')
+    coordinator.send('wipe', 1, True, '')
+    coordinator.expect('integrate')
+    coordinator.send('integrate', 1, True, 0.0, '2026-10-17T00:00:00', False, '')
+
+    assert not coordinator.conn.poll(0.2)
+    coordinator.send('cleared', 1)
+    coordinator.expect('read')
+    coordinator.expect('done')
+
+
+def test_release_and_stale_messages(coordinator):
+    coordinator.send('expose', 1)
+    coordinator.expect('wipe')
+    coordinator.send('release', 1)
+
+    # messages of a released visit are ignored, next visit is controlled by the same worker.
+    coordinator.send('wipe', 1, True, '')
+    coordinator.send('expose', 2)
+    coordinator.expect('wipe', visit=2)
+    coordinator.send('cleared', 1)
+    coordinator.send('wipe', 2, True, '')
+    coordinator.expect('integrate', visit=2)
+    coordinator.send('release', 2)
@@ -0,0 +1,88 @@
+from spsActor.utils.resources import ResourceManager, exposureResources
+
+
+def test_lease_and_release():
+    resources = ResourceManager()
+
+    assert resources.lease(1, {'b1', 'r1', 'enu_sm1'}) == []
+    assert not resources.isFree({'b1'})
+    assert resources.isFree({'b2'})
+
+    resources.release(1)
+    assert resources.isFree({'b1', 'r1', 'enu_sm1'})
+    assert resources.leases == dict()
+    assert resources.shared == dict()
+
+
+def test_conflicting_lease_leases_nothing():
+    resources = ResourceManager()
+    resources.lease(1, {'b1', 'enu_sm1'})
+
+    assert resources.lease(2, {'b2', 'enu_sm1'}) == ['enu_sm1(1)']
+    assert resources.isFree({'b2'})
+
+
+def test_share_cameras_between_pipelined_owners():
+    resources = ResourceManager()
+    resources.lease(1, {'b1', 'r1'}, shareable={'b1', 'r1'})
+
+    assert resources.lease(2, {'b1', 'r1'}, shareable={'b1', 'r1'}) == []
+    assert resources.leases['b1'] == [1, 2]
+
+    resources.release(1)
+    assert resources.leases['b1'] == [2]
+    assert resources.shared['b1'] == {2}
+
+    resources.release(2)
+    assert resources.isFree({'b1', 'r1'})
+
+
+def test_share_requires_every_owner_agreement():
+    resources = ResourceManager()
+    resources.lease(1, {'b1'})
+
+    # first owner did not agree to share.
+    assert resources.lease(2, {'b1'}, shareable={'b1'}) == ['b1(1)']
+
+    resources.release(1)
+    resources.lease(2, {'b1'}, shareable={'b1'})
+
+    # second owner did not declare it shareable.
+    assert resources.lease(3, {'b1'}) == ['b1(2)']
+
+
+def test_shareable_cameras_do_not_share_other_resources():
+    resources = ResourceManager()
+    resources.lease(1, {'b1', 'enu_sm1'}, shareable={'b1'})
+
+    assert resources.lease(2, {'b1', 'enu_sm1'}, shareable={'b1'}) == ['enu_sm1(1)']
+
+
+def test_owners_and_leased_by():
+    resources = ResourceManager()
+    resources.lease(1, {'b1', 'enu_sm1'}, shareable={'b1', 'enu_sm1'})
+    resources.lease(2, {'b1', 'r1', 'enu_sm1'}, shareable={'b1', 'r1', 'enu_sm1'})
+
+    assert resources.owners('b1') == [1, 2]
+    assert resources.owners('b2') == []
+    assert resources.leasedBy(2) == {'b1', 'r1', 'enu_sm1'}
+
+    resources.release(1)
+    assert resources.owners('enu_sm1') == [2]
+    assert resources.leasedBy(1) == set()
+
+
+def test_exposure_resources():
+    class FakeCam(object):
+        def __init__(self, arm, specNum):
+            self.arm = arm
+            self.specNum = specNum
+
+        def __str__(self):
+            return f'{self.arm}{self.specNum}'
+
+    cams = [FakeCam('b', 1), FakeCam('r', 2)]
+
+    assert exposureResources(None, cams, 'dark') == {'b1', 'r2'}
+    assert exposureResources(None, cams, 'arc', doIIS=True, doSlideSlit=True) == {'b1', 'r2', 'enu_sm1', 'enu_sm2',
+                                                                                 'iis', 'slit_sm1', 'slit_sm2'}
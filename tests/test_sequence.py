@@ -0,0 +1,84 @@
+from spsActor.utils import exception
+from spsActor.utils.sequence import ExposureSequence
+
+
+class FakeCmd(object):
+    def __init__(self):
+        self.replies = []
+
+    def inform(self, response):
+        self.replies.append(('i', response))
+
+    def warn(self, response):
+        self.replies.append(('w', response))
+
+
+class FakeExposure(object):
+    """Record start, collect and exit calls in a shared journal."""
+    journal = []
+    failing = set()
+
+    def __init__(self, actor, visit, doPipeline, **kwargs):
+        self.visit = visit
+        self.failures = exception.Failures()
+
+    def start(self, cmd, visit):
+        FakeExposure.journal.append(('start', visit))
+
+    def collect(self, cmd, visit):
+        FakeExposure.journal.append(('collect', visit))
+
+        if visit in FakeExposure.failing:
+            self.failures.add('ReadFailed()')
+
+        return f'fileIds={visit}'
+
+    def exit(self):
+        FakeExposure.journal.append(('exit', self.visit))
+
+
+def runSequence(visits, doPipeline, failing=()):
+    FakeExposure.journal = []
+    FakeExposure.failing = set(failing)
+    cmd, ongoing = FakeCmd(), dict()
+    sequence = ExposureSequence(None, visits, FakeExposure, doPipeline)
+    sequence.run(cmd, ongoing)
+
+    assert ongoing == dict()
+    return sequence, cmd, [(call, visit) for call, visit in FakeExposure.journal if call != 'exit']
+
+
+def test_frames_run_one_after_the_other():
+    sequence, cmd, journal = runSequence([1, 2, 3], doPipeline=False)
+
+    assert journal == [('start', 1), ('collect', 1), ('start', 2), ('collect', 2), ('start', 3), ('collect', 3)]
+    assert cmd.replies == [('i', 'fileIds=1'), ('i', 'fileIds=2'), ('i', 'fileIds=3')]
+    assert sequence.nDone == 3
+
+
+def test_next_frame_starts_before_previous_is_collected():
+    sequence, cmd, journal = runSequence([1, 2, 3], doPipeline=True)
+
+    assert journal == [('start', 1), ('start', 2), ('collect', 1), ('start', 3), ('collect', 2), ('collect', 3)]
+    assert sequence.nDone == 3
+
+
+def test_failed_frame_stops_the_sequence():
+    sequence, cmd, journal = runSequence([1, 2, 3], doPipeline=False, failing={1})
+
+    assert journal == [('start', 1), ('collect', 1)]
+    assert cmd.replies == [('w', 'fileIds=1')]
+    assert sequence.failures.format() == 'ReadFailed()'
+
+
+def test_failed_pipelined_frame_still_collects_frame_in_flight():
+    sequence, cmd, journal = runSequence([1, 2, 3], doPipeline=True, failing={1})
+
+    assert journal == [('start', 1), ('start', 2), ('collect', 1), ('collect', 2)]
+    assert sequence.nDone == 2
+
+
+def test_every_frame_exits():
+    runSequence([1, 2, 3], doPipeline=True)
+
+    assert sorted([visit for call, visit in FakeExposure.journal if call == 'exit']) == [1, 2, 3]
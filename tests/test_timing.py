@@ -0,0 +1,32 @@
+import pytest
+from spsActor.utils.timing import TimingModel
+
+
+def test_no_prediction_until_enough_samples():
+    model = TimingModel()
+
+    for __ in range(TimingModel.minSamples - 1):
+        model.update('n1Reset', 10)
+        assert model.predict('n1Reset') is None
+
+    model.update('n1Reset', 10)
+    assert model.predict('n1Reset') == pytest.approx(10)
+
+
+def test_exponentially_weighted_average():
+    model = TimingModel()
+
+    for duration in [10, 10, 20]:
+        model.update('b1Wipe', duration)
+
+    assert model.predict('b1Wipe') == pytest.approx(TimingModel.alpha * 20 + (1 - TimingModel.alpha) * 10)
+
+
+def test_names_are_independent():
+    model = TimingModel()
+
+    for __ in range(TimingModel.minSamples):
+        model.update('b1Wipe', 5)
+
+    assert model.predict('r1Wipe') is None
+    assert model.predict('b1Wipe') == pytest.approx(5)